@@ -0,0 +1,121 @@
+"""Замер онлайн-резервного копирования и восстановления базы SQLite и
+снимка состояния JSON-хранилища.
+
+Создает базу и JSON-файлы задач заданного размера, снимает копии в
+отдельном потоке и одновременно измеряет задержки event loop.
+
+Запуск: python -m benchmarks.bench_backup --size-mb 2048 --state-tasks 200000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+from database import backup
+
+ROW_SIZE = 64 * 1024
+
+
+def make_database(path: str, size_mb: int):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE payload (id INTEGER PRIMARY KEY, data BLOB)")
+    rows = size_mb * 1024 * 1024 // ROW_SIZE
+    for start in range(0, rows, 256):
+        conn.executemany(
+            "INSERT INTO payload (data) VALUES (?)",
+            ((os.urandom(ROW_SIZE // 4) * 4,) for _ in range(min(256, rows - start)))
+        )
+        conn.commit()
+    conn.close()
+
+
+def make_state(directory: str, tasks: int):
+    """JSON-файлы хранилища и архив с задачами, как их пишет JsonStore"""
+    users = max(tasks // 20, 1)
+    data = {
+        user_id: [
+            {'text': f"Задача {i}", 'completed': False, 'created_at': "2024-01-01 10:00",
+             'completed_at': None, 'deadline': None, 'reminders': []}
+            for i in range(20)
+        ]
+        for user_id in range(1, users + 1)
+    }
+    files = {}
+    for part, payload in (('tasks', data), ('reminders', {}), ('stats', {}), ('lists', {})):
+        files[part] = os.path.join(directory, f"{part}.json")
+        with open(files[part], 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+
+    archive_dir = os.path.join(directory, 'archive')
+    for user_id in range(1, min(users, 100) + 1):
+        os.makedirs(os.path.join(archive_dir, str(user_id)), exist_ok=True)
+        with open(os.path.join(archive_dir, str(user_id), 'index.json'), 'w') as f:
+            json.dump({'2024-01.jsonl.gz': 0}, f)
+    return files, archive_dir
+
+
+async def watch_loop(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Максимальное опоздание тиков event loop"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size-mb', type=int, default=64)
+    parser.add_argument('--state-tasks', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files, archive_dir = make_state(tmp, args.state_tasks)
+        stop = asyncio.Event()
+        watcher = asyncio.create_task(watch_loop(stop))
+        result = await asyncio.to_thread(backup.snapshot_state, files, archive_dir, os.path.join(tmp, 'backups'))
+        stop.set()
+        worst_lag = await watcher
+        print(
+            f"Снимок состояния ({args.state_tasks} задач, {result['source_size'] / 1024 / 1024:.1f} МБ): "
+            f"{result['duration']:.2f} с, макс. задержка event loop {worst_lag * 1000:.1f} мс"
+        )
+        started = time.perf_counter()
+        backup.verify_snapshots([result['path']])
+        backup.restore_state(result['path'], files, archive_dir)
+        print(f"Восстановление состояния: {time.perf_counter() - started:.2f} с")
+
+        db_path = os.path.join(tmp, 'bot.db')
+        backup_dir = os.path.join(tmp, 'backups')
+
+        started = time.perf_counter()
+        make_database(db_path, args.size_mb)
+        print(f"База {os.path.getsize(db_path) / 1024 / 1024:.0f} МБ создана за {time.perf_counter() - started:.1f} с")
+
+        stop = asyncio.Event()
+        watcher = asyncio.create_task(watch_loop(stop))
+        result = await asyncio.to_thread(backup.backup_sqlite, db_path, backup_dir)
+        stop.set()
+        worst_lag = await watcher
+
+        size_mb = result['source_size'] / 1024 / 1024
+        print(
+            f"Копия: {result['duration']:.2f} с ({size_mb / result['duration']:.0f} МБ/с), "
+            f"сжато до {result['size'] / 1024 / 1024:.0f} МБ, "
+            f"макс. задержка event loop {worst_lag * 1000:.1f} мс"
+        )
+
+        started = time.perf_counter()
+        valid = backup.verify_checksum(result['path'])
+        print(f"Проверка sha256: {'ok' if valid else 'ОШИБКА'} за {time.perf_counter() - started:.2f} с")
+
+        duration = backup.restore_sqlite(result['path'], db_path)
+        print(f"Восстановление: {duration:.2f} с ({size_mb / duration:.0f} МБ/с)")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,163 @@
+"""Время импорта и запуска бота.
+
+Запуск: python -m benchmarks.bench_startup --tasks 20 --users 1000 --reminders 5000
+
+Импорт замеряется через python -X importtime (лучший из --runs запусков),
+запуск - вызовом on_startup/on_shutdown в отдельном процессе на временных
+данных в JSON-хранилище. Сеть не используется. on_startup - время до начала
+опроса Telegram, ready - до начала обработки апдейтов.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Сколько самых тяжелых пакетов показывать
+TOP_PACKAGES = 12
+# Предел для одного запуска: зависший процесс (например, незакрытое соединение БД) - ошибка
+RUN_TIMEOUT = 120
+
+STARTUP_SCRIPT = """
+import asyncio, json, sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+import bot
+imported = time.perf_counter()
+
+async def run():
+    t0 = time.perf_counter()
+    await bot.on_startup()
+    t1 = time.perf_counter()
+    await bot.startup_gate.ready.wait()
+    t2 = time.perf_counter()
+    await bot.on_shutdown()
+    t3 = time.perf_counter()
+    return t1 - t0, t2 - t0, t3 - t2
+
+startup, ready, shutdown = asyncio.run(run())
+print(json.dumps({{'import': imported - started, 'startup': startup, 'ready': ready, 'shutdown': shutdown}}))
+"""
+
+
+def bench_env() -> dict:
+    env = dict(os.environ)
+    env.update({'BOT_TOKEN': '123456:benchmark', 'STORAGE_BACKEND': 'json', 'PROFILE': '0'})
+    return env
+
+
+def parse_importtime(stderr: str):
+    """Общее время импорта и собственное время по пакетам верхнего уровня (мкс)"""
+    total = 0
+    packages = Counter()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        packages[name.strip().split('.')[0]] += int(self_us)
+        if not name.startswith('  '):
+            total += int(cumulative_us)
+    return total, packages
+
+
+def measure_import(runs: int, cwd: str):
+    best = None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f"import sys; sys.path.insert(0, {ROOT!r}); import bot"],
+            cwd=cwd, env=bench_env(), capture_output=True, text=True, check=True, timeout=RUN_TIMEOUT
+        )
+        total, packages = parse_importtime(result.stderr)
+        if best is None or total < best[0]:
+            best = (total, packages)
+    return best
+
+
+def write_dataset(directory: str, users: int, tasks_per_user: int, reminders: int):
+    now = datetime.now().replace(second=0, microsecond=0)
+    created_at = now.strftime("%Y-%m-%d %H:%M")
+    tasks = {
+        user_id: [
+            {
+                'text': f"Задача {i}",
+                'completed': False,
+                'created_at': created_at,
+                'completed_at': None,
+                'deadline': int((now + timedelta(days=1)).timestamp()) if i % 2 else None,
+                'reminders': []
+            }
+            for i in range(tasks_per_user)
+        ]
+        for user_id in range(1, users + 1)
+    }
+    reminder_items = {}
+    for i in range(reminders):
+        user_id = i % users + 1
+        reminder_time = int((now + timedelta(hours=1, seconds=i)).timestamp())
+        reminder_items[f"{user_id}_0_{reminder_time}"] = {
+            'user_id': user_id,
+            'task_index': 0,
+            'reminder_time': reminder_time,
+            'task_text': "Задача 0"
+        }
+
+    # Статистика уже есть у всех списков: разовое заполнение счетчиков из задач
+    # (seed_missing_stats) не входит в обычный запуск
+    stats = {
+        user_id: {
+            'created': tasks_per_user, 'completed': 0, 'completed_late': 0, 'latency_total': 0,
+            'latency': {'1h': 0, '1d': 0, '1w': 0, 'more': 0}, 'days': {}, 'weeks': {}
+        }
+        for user_id in tasks
+    }
+
+    for name, data in (('tasks_data.json', tasks), ('reminders_data.json', reminder_items), ('stats_data.json', stats)):
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+    os.makedirs(os.path.join(directory, 'data'), exist_ok=True)
+
+
+def measure_startup(cwd: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, '-c', STARTUP_SCRIPT.format(root=ROOT)],
+        cwd=cwd, env=bench_env(), capture_output=True, text=True, check=True, timeout=RUN_TIMEOUT
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--tasks', type=int, default=20)
+    parser.add_argument('--reminders', type=int, default=5000)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        total, packages = measure_import(args.runs, tmp)
+        print(f"Импорт bot: {total / 1000:.0f} мс (лучший из {args.runs})")
+        print(f"{'package':<24} {'self ms':>10}")
+        for package, self_us in packages.most_common(TOP_PACKAGES):
+            print(f"{package:<24} {self_us / 1000:>10.1f}")
+
+        write_dataset(tmp, args.users, args.tasks, args.reminders)
+        started = time.perf_counter()
+        timings = measure_startup(tmp)
+        wall = time.perf_counter() - started
+
+    print(
+        f"\nЗапуск на {args.users * args.tasks} задачах и {args.reminders} напоминаниях:\n"
+        f"import {timings['import'] * 1000:.0f} мс, on_startup {timings['startup'] * 1000:.0f} мс, "
+        f"ready {timings['ready'] * 1000:.0f} мс, on_shutdown {timings['shutdown'] * 1000:.0f} мс, "
+        f"процесс целиком {wall * 1000:.0f} мс"
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Проверка совместимости и замер скорости хранилищ задач.
+
+Запуск: python -m benchmarks.bench_stores --users 500 --tasks 20
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from database.database import Base
+from database.sql_store import SqlStore
+from database.store import JsonStore, MemoryStore
+
+
+def make_dataset(users: int, tasks_per_user: int):
+    now = datetime.now().replace(second=0, microsecond=0)
+    tasks = {}
+    reminders = {}
+    stats = {}
+
+    for user_id in range(1, users + 1):
+        tasks[user_id] = [
+            {
+                'text': f"Задача {i} пользователя {user_id}",
+                'completed': i % 3 == 0,
+                'created_at': now.strftime("%Y-%m-%d %H:%M"),
+                'completed_at': now.strftime("%Y-%m-%d %H:%M") if i % 3 == 0 else None,
+                'deadline': int((now + timedelta(days=i)).timestamp()) if i % 2 else None,
+                'reminders': []
+            }
+            for i in range(tasks_per_user)
+        ]
+        stats[user_id] = {'created': tasks_per_user, 'completed': tasks_per_user // 3}
+        reminder_time = now + timedelta(hours=user_id)
+        reminders[f"{user_id}_1_{int(reminder_time.timestamp())}"] = {
+            'user_id': user_id,
+            'task_index': 1,
+            'reminder_time': int(reminder_time.timestamp()),
+            'task_text': tasks[user_id][1]['text']
+        }
+
+    return tasks, reminders, stats
+
+
+async def check_conformance(store, tasks, reminders, stats):
+    """Одинаковое поведение всех хранилищ"""
+    await store.save_tasks(tasks)
+    await store.save_stats(stats)
+    await store.save_reminders(reminders)
+
+    assert await store.load_tasks() == tasks, "задачи не совпадают после сохранения"
+    assert await store.load_stats() == stats, "статистика не совпадает после сохранения"
+    assert await store.load_reminders() == reminders, "напоминания не совпадают после сохранения"
+
+    # Частичное сохранение одного пользователя
+    user_id = next(iter(tasks))
+    tasks[user_id].pop()
+    tasks[user_id][0]['completed'] = not tasks[user_id][0]['completed']
+    await store.save_tasks(tasks, [user_id])
+    assert (await store.load_tasks())[user_id] == tasks[user_id], "частичное сохранение не применилось"
+
+    # Удаление напоминания
+    removed = next(iter(reminders))
+    del reminders[removed]
+    await store.save_reminders(reminders)
+    assert removed not in await store.load_reminders(), "удаленное напоминание осталось"
+
+    # Перенос task_index: удаление задачи перед задачей с напоминанием (remove_tasks)
+    key, reminder = next(iter(reminders.items()))
+    tasks[reminder['user_id']].pop(0)
+    reminder['task_index'] -= 1
+    await store.save_tasks(tasks, [reminder['user_id']])
+    await store.save_reminders(reminders)
+    assert (await store.load_reminders())[key] == reminder, "измененный task_index не сохранился"
+
+    # Общий список группового чата: вступление и выход участников
+    lists = {-100: {'title': "Команда", 'members': [1, 2, 3]}}
+    await store.save_lists(lists)
+    assert await store.load_lists() == lists, "общие списки не совпадают после сохранения"
+    lists[-100]['members'] = [1, 3, 4]
+    await store.save_lists(lists)
+    assert await store.load_lists() == lists, "изменение участников не применилось"
+    await store.save_lists({})
+    assert await store.load_lists() == {}, "удаленный список остался"
+
+
+async def measure(store, tasks, reminders, stats, rounds: int):
+    timings = {}
+
+    started = time.perf_counter()
+    await store.save_tasks(tasks)
+    await store.save_stats(stats)
+    await store.save_reminders(reminders)
+    timings['full save'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await store.load_tasks()
+    await store.load_stats()
+    await store.load_reminders()
+    timings['full load'] = time.perf_counter() - started
+
+    # Типичное изменение: один пользователь отметил задачу
+    user_ids = list(tasks)
+    started = time.perf_counter()
+    for i in range(rounds):
+        user_id = user_ids[i % len(user_ids)]
+        tasks[user_id][0]['completed'] = not tasks[user_id][0]['completed']
+        await store.save_tasks(tasks, [user_id])
+        await store.save_stats(stats, [user_id])
+        await store.save_reminders(reminders)
+    timings['single-user save'] = (time.perf_counter() - started) / rounds
+
+    return timings
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--tasks', type=int, default=20)
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        stores = {
+            'memory': MemoryStore(),
+            'json': JsonStore(
+                os.path.join(tmp, 'tasks.json'),
+                os.path.join(tmp, 'reminders.json'),
+                os.path.join(tmp, 'stats.json'),
+                os.path.join(tmp, 'lists.json')
+            ),
+            'sql': SqlStore(async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)),
+        }
+
+        print(f"Пользователей: {args.users}, задач на пользователя: {args.tasks}\n")
+        print(f"{'store':<8} {'full save ms':>14} {'full load ms':>14} {'single-user save ms':>20}")
+
+        for name, store in stores.items():
+            await check_conformance(store, *make_dataset(3, 4))
+            timings = await measure(store, *make_dataset(args.users, args.tasks), args.rounds)
+            print(
+                f"{name:<8} {timings['full save'] * 1000:>14.1f} {timings['full load'] * 1000:>14.1f} "
+                f"{timings['single-user save'] * 1000:>20.2f}"
+            )
+
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
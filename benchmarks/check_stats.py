@@ -0,0 +1,67 @@
+"""Проверка счетчиков статистики на длинной истории задач.
+
+Запуск: python -m benchmarks.check_stats --tasks 100 --days 200
+
+Список без статистики заполняется из задач (seed_missing_stats), у которых
+между созданием и выполнением больше дней, чем хранит дневная разбивка;
+затем выполнение самой старой задачи отменяется.
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+os.environ.setdefault('BOT_TOKEN', '123456:check')
+os.environ['STORAGE_BACKEND'] = 'memory'
+
+import bot  # noqa: E402
+
+LIST_ID = 1
+
+
+def make_history(tasks: int, days: int):
+    now = datetime.now().replace(second=0, microsecond=0)
+    history = []
+    for i in range(tasks):
+        created_at = now - timedelta(days=days + tasks - i)
+        history.append({
+            'text': f"Задача {i}",
+            'completed': True,
+            'created_at': created_at.strftime("%Y-%m-%d %H:%M"),
+            'completed_at': (created_at + timedelta(days=days)).strftime("%Y-%m-%d %H:%M"),
+            'deadline': None,
+            'reminders': []
+        })
+    return history
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tasks', type=int, default=100)
+    parser.add_argument('--days', type=int, default=200)
+    args = parser.parse_args()
+
+    bot.store.tasks = {LIST_ID: make_history(args.tasks, args.days)}
+    await bot.load_data()
+
+    stats = bot.stats_storage[LIST_ID]
+    assert stats['created'] == args.tasks, "созданные задачи учтены не все"
+    assert stats['completed'] == args.tasks, "выполненные задачи учтены не все"
+    assert len(stats['days']) <= bot.STATS_DAYS_KEPT, "дневная разбивка не обрезана"
+    assert len(stats['weeks']) <= bot.STATS_WEEKS_KEPT, "недельная разбивка не обрезана"
+
+    # Отмена выполнения задачи, день выполнения которой уже вне окна
+    oldest = bot.tasks_storage[LIST_ID][0]
+    bot.record_task_reopened(LIST_ID, oldest)
+    assert stats['completed'] == args.tasks - 1, "отмена выполнения не учтена"
+    assert all(period['completed'] >= 0 for period in stats['days'].values()), "отрицательный счетчик за день"
+
+    await bot.save_task
+    print(
+        f"ok: {args.tasks} задач, дней в разбивке {len(stats['days'])}, "
+        f"недель {len(stats['weeks'])}"
+    )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,18 +1,30 @@
 import asyncio
-import json
+import bisect
 import os
 import re
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+import time
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from aiogram import Bot, Dispatcher, types, F
-from aiogram.filters import Command
+from aiogram.filters import Command, StateFilter
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.storage.memory import MemoryStorage
 from dotenv import load_dotenv
 
+from database.archive import TaskArchive
+from database.store import create_store
+from middlewares import CallbackDebounceMiddleware, InflightMiddleware, StartupGateMiddleware, UserLockMiddleware
+from notifications import FanoutNotifier, RateLimiter, send_limited
+from profiling import profiler, span
+
+if TYPE_CHECKING:
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    from database.models import User
+
 # Загружаем переменные окружения
 load_dotenv()
 
@@ -20,16 +32,123 @@ load_dotenv()
 bot = Bot(token=os.getenv('BOT_TOKEN'))
 storage = MemoryStorage()
 dp = Dispatcher(storage=storage)
-scheduler = AsyncIOScheduler()
+# Планировщик создается в on_startup, а не при импорте модуля (см. get_scheduler):
+# импорт бота не загружает APScheduler
+scheduler: Optional["AsyncIOScheduler"] = None
+
+# Сколько апдейтов обрабатывать одновременно (апдейты одного пользователя - по очереди)
+MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', '100'))
+# Окно, в котором повторные нажатия той же кнопки считаются дубликатами (секунды)
+CALLBACK_DEBOUNCE_SECONDS = float(os.getenv('CALLBACK_DEBOUNCE_SECONDS', '1.5'))
 
-# Хранилище задач (в реальном проекте используйте базу данных)
+# Учет обрабатываемых апдейтов для корректной остановки
+inflight = InflightMiddleware()
+dp.update.outer_middleware(inflight)
+# До окончания фоновой инициализации при старте апдейты ждут
+startup_gate = StartupGateMiddleware()
+dp.update.outer_middleware(startup_gate)
+# Повторные нажатия кнопок отбрасываются до ожидания блокировки пользователя
+callback_debounce = CallbackDebounceMiddleware(CALLBACK_DEBOUNCE_SECONDS)
+dp.update.outer_middleware(callback_debounce)
+# Обработчики мутируют списки задач, поэтому апдейты одного чата сериализуются
+user_locks = UserLockMiddleware(MAX_CONCURRENT_UPDATES)
+dp.update.outer_middleware(user_locks)
+
+# Хранилище задач по спискам: ID чата (в личном чате совпадает с ID пользователя)
 tasks_storage: Dict[int, List[Dict]] = {}
 # Хранилище напоминаний
 reminders_storage: Dict[str, Dict] = {}
+# Агрегированная статистика пользователей, обновляется при каждом изменении задач
+stats_storage: Dict[int, Dict] = {}
+# Индекс напоминаний, отсортированный по времени: (UTC epoch, reminder_id)
+reminder_index: List[Tuple[int, str]] = []
+# Часовые пояса пользователей (IANA), хранятся в таблице users
+user_timezones: Dict[int, str] = {}
+# Общие списки групповых чатов: ID чата -> {'title': ..., 'members': [ID пользователей]}
+lists_storage: Dict[int, Dict] = {}
+# Индексы участия: список -> участники и пользователь -> списки
+list_members: Dict[int, Set[int]] = {}
+member_lists: Dict[int, Set[int]] = {}
+
+# Часовой пояс по умолчанию для пользователей и ежедневных заданий
+DEFAULT_TIMEZONE = os.getenv('DEFAULT_TIMEZONE', 'Europe/Moscow')
 
 # Файлы для сохранения данных
 DATA_FILE = "tasks_data.json"
 REMINDERS_FILE = "reminders_data.json"
+STATS_FILE = "stats_data.json"
+LISTS_FILE = "lists_data.json"
+
+# Хранилище данных: memory, json или sql
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json')
+store = create_store(STORAGE_BACKEND, DATA_FILE, REMINDERS_FILE, STATS_FILE, LISTS_FILE)
+
+# Архив выполненных задач: задачи, выполненные более ARCHIVE_AFTER_DAYS дней назад,
+# переносятся из активного списка в сжатые файлы
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'data/archive')
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '7'))
+ARCHIVE_PAGE_SIZE = 10
+archive = TaskArchive(ARCHIVE_DIR)
+
+# Резервные копии: каталог и сколько снимков каждого вида хранить
+BACKUP_DIR = os.getenv('BACKUP_DIR', 'data/backups')
+BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', '14'))
+
+# Списки с несохраненными изменениями
+dirty_lists: Set[int] = set()
+dirty_all = False
+lists_dirty = False
+save_lock = asyncio.Lock()
+save_task: Optional[asyncio.Task] = None
+# Повтор неудачной записи: пауза удваивается от FLUSH_RETRY_SECONDS до FLUSH_RETRY_MAX_SECONDS
+FLUSH_RETRY_SECONDS = 1
+FLUSH_RETRY_MAX_SECONDS = 60
+flush_retry_delay = 0
+flush_retry: Optional[asyncio.TimerHandle] = None
+
+# Администраторы бота (ID через запятую)
+ADMIN_IDS = {int(x) for x in os.getenv('ADMIN_IDS', '').split(',') if x.strip()}
+
+# Сколько дней и недель хранить в разбивке статистики
+STATS_DAYS_KEPT = 90
+STATS_WEEKS_KEPT = 52
+# Корзины гистограммы времени выполнения (в минутах)
+LATENCY_BUCKETS = [
+    ('1h', 60),
+    ('1d', 24 * 60),
+    ('1w', 7 * 24 * 60),
+    ('more', None),
+]
+
+# Сколько секунд ждать завершения обработчиков при остановке
+SHUTDOWN_TIMEOUT = 10
+
+# Напоминания передаются планировщику за REMINDER_HORIZON_MINUTES до срабатывания,
+# более дальние ждут в reminder_index; перенос - каждые REMINDER_REFILL_MINUTES
+REMINDER_HORIZON_MINUTES = 30
+REMINDER_REFILL_MINUTES = 10
+# До какого момента (UTC epoch) напоминания из индекса уже переданы планировщику
+scheduled_until = 0
+# За сколько дней активности пользователей загружать в кэш при старте
+RECENT_USERS_DAYS = 7
+
+# Сколько задач перечислять в ответе на пакетное добавление
+BATCH_SUMMARY_LIMIT = 30
+
+# Общий темп исходящих сообщений: напоминания, сводки и рассылки
+# (лимит Telegram - около 30 сообщений в секунду)
+OUTBOUND_RATE = float(os.getenv('OUTBOUND_RATE', '25'))
+outbound = RateLimiter(OUTBOUND_RATE)
+
+# Изменения общих списков копятся FANOUT_WINDOW_SECONDS и рассылаются участникам сводкой
+FANOUT_WINDOW_SECONDS = float(os.getenv('FANOUT_WINDOW_SECONDS', '5'))
+notifier = FanoutNotifier(
+    bot.send_message,
+    members=lambda list_id: list_members.get(list_id, set()),
+    title=lambda list_id: lists_storage.get(list_id, {}).get('title') or "Общий список",
+    window=FANOUT_WINDOW_SECONDS,
+    limiter=outbound
+)
 
 # Состояния FSM
 class TaskStates(StatesGroup):
@@ -39,42 +158,351 @@ class TaskStates(StatesGroup):
     waiting_for_task_edit = State()
     waiting_for_deadline_edit = State()
 
-# Загрузка данных из файла
-def load_data():
-    global tasks_storage, reminders_storage
-    try:
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            tasks_storage = json.load(f)
-            tasks_storage = {int(k): v for k, v in tasks_storage.items()}
-    except (FileNotFoundError, json.JSONDecodeError):
-        tasks_storage = {}
+# Загрузка данных из хранилища
+async def load_data():
+    global tasks_storage, reminders_storage, stats_storage, lists_storage
+    tasks_storage, reminders_storage, stats_storage, lists_storage = await asyncio.gather(
+        store.load_tasks(),
+        store.load_reminders(),
+        store.load_stats(),
+        store.load_lists()
+    )
+    migrate_legacy_times()
+    seed_missing_stats()
+    rebuild_reminder_index()
+    rebuild_member_index()
+
+# Перевод дедлайнов и времени напоминаний из ISO-строк (локальное время сервера) в UTC epoch
+def migrate_legacy_times():
+    for tasks in tasks_storage.values():
+        for task in tasks:
+            if isinstance(task.get('deadline'), str):
+                task['deadline'] = to_epoch(datetime.fromisoformat(task['deadline']))
+    
+    for reminder in reminders_storage.values():
+        if isinstance(reminder['reminder_time'], str):
+            reminder['reminder_time'] = to_epoch(datetime.fromisoformat(reminder['reminder_time']))
+
+# Время в UTC epoch; наивное время считается локальным временем сервера
+def to_epoch(dt: datetime) -> int:
+    return int(dt.timestamp())
+
+# Часовой пояс списка: пользователя или группового чата
+def get_user_zone(list_id: int) -> ZoneInfo:
+    return ZoneInfo(user_timezones.get(list_id, DEFAULT_TIMEZONE))
+
+# Текущее время в часовом поясе списка
+def user_now(list_id: int) -> datetime:
+    return datetime.now(get_user_zone(list_id))
+
+# Время из UTC epoch в часовом поясе списка
+def from_epoch(timestamp: int, list_id: int) -> datetime:
+    return datetime.fromtimestamp(timestamp, get_user_zone(list_id))
+
+# Планировщик заданий; создается при первом обращении.
+# Работает в UTC, время напоминаний хранится как UTC epoch
+def get_scheduler() -> "AsyncIOScheduler":
+    global scheduler
+    if scheduler is None:
+        from apscheduler.events import EVENT_JOB_SUBMITTED
+        from apscheduler.schedulers.asyncio import AsyncIOScheduler
+        
+        scheduler = AsyncIOScheduler(timezone=timezone.utc)
+        scheduler.add_listener(on_scheduler_job_event, EVENT_JOB_SUBMITTED)
+    return scheduler
+
+# Перестроение индекса напоминаний
+def rebuild_reminder_index():
+    reminder_index[:] = sorted(
+        (reminder['reminder_time'], reminder_id)
+        for reminder_id, reminder in reminders_storage.items()
+    )
+
+# Напоминания со временем в диапазоне [start, end) - срез отсортированного индекса
+def reminders_between(start: int, end: int) -> List[str]:
+    left = bisect.bisect_left(reminder_index, (start, ''))
+    right = bisect.bisect_left(reminder_index, (end, ''))
+    return [reminder_id for _, reminder_id in reminder_index[left:right]]
+
+# Удаление напоминания из хранилища, индекса и планировщика
+def delete_reminder(reminder_id: str):
+    reminder = reminders_storage.pop(reminder_id, None)
+    if reminder is None:
+        return
+    
+    position = bisect.bisect_left(reminder_index, (reminder['reminder_time'], reminder_id))
+    if position < len(reminder_index) and reminder_index[position][1] == reminder_id:
+        del reminder_index[position]
     
+    if scheduler is None:
+        return
     try:
-        with open(REMINDERS_FILE, 'r', encoding='utf-8') as f:
-            reminders_storage = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        reminders_storage = {}
+        scheduler.remove_job(reminder_id)
+    except Exception:
+        pass
 
-# Сохранение данных в файл
-def save_data():
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(tasks_storage, f, ensure_ascii=False, indent=2)
-    
-    with open(REMINDERS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(reminders_storage, f, ensure_ascii=False, indent=2)
+# Запись изменений в хранилище. Несколько вызовов save_data() подряд
+# объединяются в одну запись; list_id ограничивает запись одним списком.
+@span("save_data")
+async def flush_data():
+    global dirty_all, lists_dirty, flush_retry_delay, flush_retry
+    async with save_lock:
+        while dirty_all or dirty_lists or lists_dirty:
+            list_ids = None if dirty_all else set(dirty_lists)
+            save_members = lists_dirty or dirty_all
+            dirty_all = False
+            lists_dirty = False
+            dirty_lists.clear()
+            
+            try:
+                await store.save_tasks(tasks_storage, list_ids)
+                await store.save_stats(stats_storage, list_ids)
+                await store.save_reminders(reminders_storage)
+                if save_members:
+                    await store.save_lists(lists_storage)
+            except Exception as e:
+                # Запись не удалась - при следующей записи сохраняем все целиком
+                dirty_all = True
+                flush_retry_delay = min(flush_retry_delay * 2 or FLUSH_RETRY_SECONDS, FLUSH_RETRY_MAX_SECONDS)
+                print(f"Ошибка записи данных: {e!r}, повтор через {flush_retry_delay} с")
+                if flush_retry is None:
+                    flush_retry = asyncio.get_running_loop().call_later(flush_retry_delay, retry_flush)
+                return
+        
+        flush_retry_delay = 0
+
+# Повторная запись после ошибки
+def retry_flush():
+    global flush_retry
+    flush_retry = None
+    schedule_flush()
+
+# Планирование записи, если она еще не запланирована
+def schedule_flush():
+    global save_task
+    if save_task is None or save_task.done():
+        save_task = asyncio.get_running_loop().create_task(flush_data())
+
+# Отметка данных как измененных и планирование записи
+def save_data(list_id: Optional[int] = None):
+    global dirty_all
+    if list_id is None:
+        dirty_all = True
+    else:
+        dirty_lists.add(list_id)
+    schedule_flush()
+
+# Отметка состава общих списков как измененного
+def save_lists():
+    global lists_dirty
+    lists_dirty = True
+    schedule_flush()
+
+# Перестроение индексов участия по общим спискам
+def rebuild_member_index():
+    list_members.clear()
+    member_lists.clear()
+    for list_id, shared_list in lists_storage.items():
+        list_members[list_id] = set(shared_list['members'])
+        for user_id in shared_list['members']:
+            member_lists.setdefault(user_id, set()).add(list_id)
+
+# Вступление пользователя в общий список чата; False - уже участник
+def join_list(list_id: int, title: str, user_id: int) -> bool:
+    shared_list = lists_storage.setdefault(list_id, {'title': title, 'members': []})
+    shared_list['title'] = title
+    members = list_members.setdefault(list_id, set())
+    if user_id in members:
+        return False
+    
+    members.add(user_id)
+    shared_list['members'].append(user_id)
+    member_lists.setdefault(user_id, set()).add(list_id)
+    save_lists()
+    return True
+
+# Выход пользователя из общего списка; False - не был участником
+def leave_list(list_id: int, user_id: int) -> bool:
+    members = list_members.get(list_id)
+    if not members or user_id not in members:
+        return False
+    
+    members.discard(user_id)
+    lists_storage[list_id]['members'].remove(user_id)
+    member_lists[user_id].discard(list_id)
+    if not member_lists[user_id]:
+        del member_lists[user_id]
+    if not members:
+        del list_members[list_id]
+        del lists_storage[list_id]
+    save_lists()
+    return True
+
+# Событие изменения списка для рассылки участникам (в личных чатах участников нет)
+def notify_members(list_id: int, user: types.User, text: str):
+    if list_members.get(list_id):
+        notifier.publish(list_id, user.id, f"{user.full_name}: {text}")
+
+# Получение счетчиков статистики пользователя
+def get_user_stats(list_id: int) -> Dict:
+    if list_id not in stats_storage:
+        stats_storage[list_id] = {
+            'created': 0,
+            'completed': 0,
+            'completed_late': 0,
+            'latency_total': 0,
+            'latency': {name: 0 for name, _ in LATENCY_BUCKETS},
+            'days': {},
+            'weeks': {}
+        }
+    return stats_storage[list_id]
+
+# Начальные счетчики для списков, у которых еще нет статистики: задачи,
+# созданные до ее появления, учитываются один раз при загрузке, иначе
+# повторное открытие такой задачи уводило бы счетчики в минус
+def seed_missing_stats():
+    for list_id, tasks in tasks_storage.items():
+        if list_id in stats_storage:
+            continue
+        get_user_stats(list_id)
+        for task in tasks:
+            record_task_created(list_id, task)
+            if task['completed'] and task.get('completed_at'):
+                record_task_completed(list_id, task)
+        save_data(list_id)
+
+# Просроченные невыполненные задачи списка на текущий момент. Это состояние,
+# а не событие: задача становится просроченной без изменения данных, поэтому
+# не хранится счетчиком, а считается по задачам списка при запросе
+def count_overdue(list_id: int) -> int:
+    now_ts = time.time()
+    return sum(
+        1 for task in tasks_storage.get(list_id, [])
+        if not task['completed'] and task.get('deadline') and task['deadline'] < now_ts
+    )
+
+# Ключи дневной и недельной разбивки для момента времени
+def stats_period_keys(moment: datetime) -> Tuple[str, str]:
+    year, week, _ = moment.isocalendar()
+    return moment.strftime("%Y-%m-%d"), f"{year}-W{week:02d}"
+
+# Изменение счетчика в дневной и недельной разбивке
+def bump_period_counter(stats: Dict, moment: datetime, counter: str, delta: int = 1):
+    day_key, week_key = stats_period_keys(moment)
+    
+    for periods_key, key, kept in (('days', day_key, STATS_DAYS_KEPT), ('weeks', week_key, STATS_WEEKS_KEPT)):
+        periods = stats[periods_key]
+        if key not in periods:
+            # Период старше всех хранимых при заполненной разбивке уже вне окна
+            if len(periods) >= kept and key < min(periods):
+                continue
+            periods[key] = {'created': 0, 'completed': 0, 'latency_total': 0}
+        periods[key][counter] += delta
+        
+        # Удаляем самые старые периоды
+        for old_key in sorted(periods)[:-kept]:
+            del periods[old_key]
+
+# Время выполнения задачи в минутах
+def task_latency(task: Dict) -> int:
+    created_at = datetime.strptime(task['created_at'], "%Y-%m-%d %H:%M")
+    completed_at = datetime.strptime(task['completed_at'], "%Y-%m-%d %H:%M")
+    return max(int((completed_at - created_at).total_seconds() // 60), 0)
+
+# Корзина гистограммы для времени выполнения
+def latency_bucket(minutes: int) -> str:
+    for name, limit in LATENCY_BUCKETS:
+        if limit is None or minutes < limit:
+            return name
+
+# Выполнена ли задача после дедлайна (completed_at - время пользователя)
+def is_completed_late(list_id: int, task: Dict) -> bool:
+    if not task.get('deadline'):
+        return False
+    completed_at = datetime.strptime(task['completed_at'], "%Y-%m-%d %H:%M")
+    return to_epoch(completed_at.replace(tzinfo=get_user_zone(list_id))) > task['deadline']
+
+# Учет созданной задачи
+def record_task_created(list_id: int, task: Dict):
+    stats = get_user_stats(list_id)
+    stats['created'] += 1
+    bump_period_counter(stats, datetime.strptime(task['created_at'], "%Y-%m-%d %H:%M"), 'created')
+
+# Учет выполненной задачи (вызывается после заполнения completed_at)
+def record_task_completed(list_id: int, task: Dict, delta: int = 1):
+    stats = get_user_stats(list_id)
+    completed_at = datetime.strptime(task['completed_at'], "%Y-%m-%d %H:%M")
+    latency = task_latency(task)
+    
+    stats['completed'] += delta
+    stats['latency_total'] += delta * latency
+    stats['latency'][latency_bucket(latency)] += delta
+    if is_completed_late(list_id, task):
+        stats['completed_late'] += delta
+    
+    bump_period_counter(stats, completed_at, 'completed', delta)
+    bump_period_counter(stats, completed_at, 'latency_total', delta * latency)
+
+# Отмена учета выполнения (вызывается до сброса completed_at)
+def record_task_reopened(list_id: int, task: Dict):
+    record_task_completed(list_id, task, delta=-1)
+
+# Форматирование длительности в минутах
+def format_duration(minutes: int) -> str:
+    if minutes < 60:
+        return f"{minutes} мин."
+    if minutes < 24 * 60:
+        return f"{minutes // 60} час. {minutes % 60} мин."
+    return f"{minutes // (24 * 60)} дн. {minutes % (24 * 60) // 60} час."
+
+# Текст отчета по статистике пользователя
+def format_user_stats(list_id: int) -> str:
+    stats = get_user_stats(list_id)
+    _, week_key = stats_period_keys(user_now(list_id))
+    week = stats['weeks'].get(week_key, {'created': 0, 'completed': 0, 'latency_total': 0})
+    
+    completion_rate = stats['completed'] / stats['created'] * 100 if stats['created'] else 0
+    
+    text = "📊 *Ваша статистика*\n\n"
+    text += f"Создано задач: *{stats['created']}*\n"
+    text += f"Выполнено: *{stats['completed']}* ({completion_rate:.0f}%)\n"
+    text += f"Выполнено после дедлайна: *{stats['completed_late']}*\n"
+    text += f"Просрочено сейчас: *{count_overdue(list_id)}*\n"
+    
+    if stats['completed']:
+        average = stats['latency_total'] // stats['completed']
+        text += f"Среднее время выполнения: *{format_duration(average)}*\n"
+        text += "\n*Время выполнения:*\n"
+        text += f"• до часа: {stats['latency']['1h']}\n"
+        text += f"• до суток: {stats['latency']['1d']}\n"
+        text += f"• до недели: {stats['latency']['1w']}\n"
+        text += f"• дольше: {stats['latency']['more']}\n"
+    
+    text += "\n*Эта неделя:*\n"
+    text += f"Создано: {week['created']}, выполнено: {week['completed']}\n"
+    
+    return text
 
 # Функция для парсинга времени из текста
-def parse_time(time_str: str) -> Optional[datetime]:
-    """Парсит время из строки в разных форматах"""
+@span("parse_time")
+def parse_time(time_str: str, zone: Optional[ZoneInfo] = None) -> Optional[datetime]:
+    """Парсит время из строки в разных форматах.
+
+    Время на часах понимается в поясе zone (по умолчанию DEFAULT_TIMEZONE),
+    результат - aware datetime в этом поясе. "Через N ..." отсчитывается в
+    UTC, поэтому переход на летнее время не сдвигает интервал.
+    """
+    zone = zone or ZoneInfo(DEFAULT_TIMEZONE)
     time_str = time_str.lower().strip()
-    now = datetime.now()
+    now_utc = datetime.now(timezone.utc)
+    now = now_utc.astimezone(zone)
     
     # Паттерны для парсинга
     patterns = [
         # Завтра в 15:30
-        (r'завтра в (\d{1,2}):(\d{2})', lambda m: now.replace(
+        (r'завтра в (\d{1,2}):(\d{2})', lambda m: (now + timedelta(days=1)).replace(
             hour=int(m.group(1)), minute=int(m.group(2)), second=0, microsecond=0
-        ) + timedelta(days=1)),
+        )),
         
         # Сегодня в 18:00
         (r'сегодня в (\d{1,2}):(\d{2})', lambda m: now.replace(
@@ -82,10 +510,10 @@ def parse_time(time_str: str) -> Optional[datetime]:
         )),
         
         # Через 2 часа
-        (r'через (\d+) час(?:а|ов)?', lambda m: now + timedelta(hours=int(m.group(1)))),
+        (r'через (\d+) час(?:а|ов)?', lambda m: now_utc + timedelta(hours=int(m.group(1)))),
         
         # Через 30 минут
-        (r'через (\d+) минут(?:у|ы)?', lambda m: now + timedelta(minutes=int(m.group(1)))),
+        (r'через (\d+) минут(?:у|ы)?', lambda m: now_utc + timedelta(minutes=int(m.group(1)))),
         
         # Через 3 дня
         (r'через (\d+) день(?:|я|ей)', lambda m: now + timedelta(days=int(m.group(1)))),
@@ -93,16 +521,16 @@ def parse_time(time_str: str) -> Optional[datetime]:
         # 2024-12-31 23:59
         (r'(\d{4})-(\d{1,2})-(\d{1,2}) (\d{1,2}):(\d{2})', 
          lambda m: datetime(int(m.group(1)), int(m.group(2)), int(m.group(3)), 
-                           int(m.group(4)), int(m.group(5)))),
+                           int(m.group(4)), int(m.group(5)), tzinfo=zone)),
         
         # 31.12.2024 23:59
         (r'(\d{1,2})\.(\d{1,2})\.(\d{4}) (\d{1,2}):(\d{2})',
          lambda m: datetime(int(m.group(3)), int(m.group(2)), int(m.group(1)),
-                           int(m.group(4)), int(m.group(5)))),
+                           int(m.group(4)), int(m.group(5)), tzinfo=zone)),
         
         # 31 декабря 2024 23:59
         (r'(\d{1,2}) (\w+) (\d{4}) (\d{1,2}):(\d{2})',
-         lambda m: parse_russian_date(m)),
+         lambda m: parse_russian_date(m).replace(tzinfo=zone)),
         
         # Просто время 15:30 (сегодня)
         (r'^(\d{1,2}):(\d{2})$', 
@@ -115,13 +543,15 @@ def parse_time(time_str: str) -> Optional[datetime]:
         if match:
             try:
                 result = handler(match)
-                if result > now:
-                    return result
-                else:
+                if result <= now:
                     # Если время уже прошло, добавляем день
-                    if pattern == patterns[-1][0]:  # Для формата "15:30"
-                        result += timedelta(days=1)
-                        return result
+                    if pattern != patterns[-1][0]:  # Только для формата "15:30"
+                        continue
+                    result += timedelta(days=1)
+                
+                # Через UTC: несуществующее при переходе на летнее время
+                # время сдвигается на реальный момент
+                return result.astimezone(timezone.utc).astimezone(zone)
             except Exception:
                 continue
     
@@ -146,12 +576,102 @@ def parse_russian_date(match):
         return datetime(year, month, day, hour, minute)
     raise ValueError("Неверное название месяца")
 
+# Разделитель между текстом задачи и дедлайном: "купить молоко — завтра в 10:00"
+DEADLINE_SEPARATOR = re.compile(r'\s+[—–-]\s+')
+# Маркеры списков в начале строки: "- ", "• ", "1. "
+LIST_MARKER = re.compile(r'^(?:[-•*]|\d+[.)])\s+')
+
+# Время внутри свободного текста - те же форматы, что понимает parse_time;
+# необязательный предлог "в" перед временем убирается вместе с ним
+QUICK_TIME = re.compile(
+    r'(?:(?<!\S)в\s+)?(?P<when>'
+    r'(?:завтра|сегодня) в \d{1,2}:\d{2}'
+    r'|через \d+ (?:час(?:а|ов)?|минут[уы]?|день(?:|я|ей))'
+    r'|\d{4}-\d{1,2}-\d{1,2} \d{1,2}:\d{2}'
+    r'|\d{1,2}\.\d{1,2}\.\d{4} \d{1,2}:\d{2}'
+    r'|\d{1,2} [а-яё]+ \d{4} \d{1,2}:\d{2}'
+    r'|(?<![\d.:])\d{1,2}:\d{2}(?![\d:])'
+    r')',
+    re.IGNORECASE
+)
+# Создание новой задачи; created_at - время пользователя, deadline - UTC epoch
+def make_task(list_id: int, text: str, deadline: Optional[datetime] = None) -> Dict:
+    return {
+        'text': text,
+        'completed': False,
+        'created_at': user_now(list_id).strftime("%Y-%m-%d %H:%M"),
+        'completed_at': None,
+        'deadline': to_epoch(deadline) if deadline else None,
+        'reminders': []
+    }
+
+# Разбор строки пакетного ввода на текст задачи и дедлайн. Третье значение -
+# после разделителя указано время, но parse_time его не принял (например, уже прошло)
+def parse_task_line(line: str, zone: Optional[ZoneInfo] = None) -> Tuple[str, Optional[datetime], bool]:
+    line = LIST_MARKER.sub('', line.strip())
+    
+    # Дедлайн ищем после последнего разделителя
+    separators = list(DEADLINE_SEPARATOR.finditer(line))
+    if separators:
+        last = separators[-1]
+        suffix = line[last.end():].strip()
+        deadline = parse_time(suffix, zone)
+        if deadline:
+            return line[:last.start()].strip(), deadline, False
+        return line, None, QUICK_TIME.fullmatch(suffix) is not None
+    
+    return line, None, False
+
+# Напоминание в конце сообщения: "напомни", "напомни за час", "напомни за 15 минут";
+# просто "напомни" считается напоминанием, только если в тексте есть срок
+QUICK_REMINDER = re.compile(
+    r'[\s,]*напомни(?:ть)?(?:\s+за\s+(?:(?P<amount>\d+)\s+)?'
+    r'(?P<unit>минут[уы]?|час(?:а|ов)?|день|дня|дней))?[\s.!]*$',
+    re.IGNORECASE
+)
+# За сколько до дедлайна напомнить, если интервал не указан
+QUICK_REMINDER_DEFAULT = timedelta(minutes=30)
+
+# Разбор быстрого добавления: "сдать отчёт завтра в 18:00 напомни за час"
+# -> текст задачи, дедлайн и за сколько до него напомнить
+def parse_quick_add(text: str, zone: Optional[ZoneInfo] = None) -> Tuple[str, Optional[datetime], Optional[timedelta]]:
+    text = original = text.strip()
+    
+    remind_before = None
+    reminder = QUICK_REMINDER.search(text)
+    if reminder:
+        remind_before = QUICK_REMINDER_DEFAULT
+        if reminder.group('unit'):
+            amount = int(reminder.group('amount') or 1)
+            unit = reminder.group('unit').lower()
+            if unit.startswith('мин'):
+                remind_before = timedelta(minutes=amount)
+            elif unit.startswith('час'):
+                remind_before = timedelta(hours=amount)
+            else:
+                remind_before = timedelta(days=amount)
+        text = text[:reminder.start()]
+    
+    # Дедлайн - последнее распознанное время в тексте
+    for match in reversed(list(QUICK_TIME.finditer(text))):
+        deadline = parse_time(match.group('when'), zone)
+        if deadline:
+            task_text = f"{text[:match.start()]} {text[match.end():]}"
+            return ' '.join(task_text.split()).strip(' ,.—–-'), deadline, remind_before
+    
+    # "Напомни" без интервала и без срока - часть текста задачи ("попросить Машу напомнить")
+    if reminder and not reminder.group('unit'):
+        return ' '.join(original.split()), None, None
+    
+    return ' '.join(text.split()), None, remind_before
+
 # Функция для создания клавиатуры с задачами
-def create_tasks_keyboard(user_id: int, task_index: int = None):
+@span("create_tasks_keyboard")
+def create_tasks_keyboard(list_id: int, task_index: int = None):
     keyboard = InlineKeyboardMarkup(inline_keyboard=[])
     
-    if user_id in tasks_storage and tasks_storage[user_id]:
-        for i, task in enumerate(tasks_storage[user_id]):
+    if list_id in tasks_storage and tasks_storage[list_id]:
+        for i, task in enumerate(tasks_storage[list_id]):
             status = "✅" if task['completed'] else "⭕"
             icon = "⏰" if task.get('deadline') else "📝"
             button_text = f"{status}{icon} {task['text'][:25]}"
@@ -167,8 +687,8 @@ def create_tasks_keyboard(user_id: int, task_index: int = None):
     action_buttons = []
     action_buttons.append(InlineKeyboardButton(text="➕ Добавить задачу", callback_data="add_task"))
     
-    if task_index is not None and user_id in tasks_storage and 0 <= task_index < len(tasks_storage[user_id]):
-        task = tasks_storage[user_id][task_index]
+    if task_index is not None and list_id in tasks_storage and 0 <= task_index < len(tasks_storage[list_id]):
+        task = tasks_storage[list_id][task_index]
         if not task['completed']:
             action_buttons.append(InlineKeyboardButton(text="⏰ Напоминание", callback_data=f"set_reminder_{task_index}"))
             action_buttons.append(InlineKeyboardButton(text="📅 Дедлайн", callback_data=f"set_deadline_{task_index}"))
@@ -186,16 +706,16 @@ def create_tasks_keyboard(user_id: int, task_index: int = None):
 def format_time(dt: datetime) -> str:
     return dt.strftime("%d.%m.%Y %H:%M")
 
-# Функция для форматирования дедлайна
-def format_deadline(deadline_str: str) -> str:
+# Функция для форматирования дедлайна (UTC epoch) во времени пользователя
+def format_deadline(deadline_ts: int, list_id: int) -> str:
     try:
-        deadline = datetime.fromisoformat(deadline_str)
-        now = datetime.now()
+        deadline = from_epoch(deadline_ts, list_id)
         
-        if deadline < now:
+        if deadline_ts < time.time():
             return "❌ Просрочено"
         
-        delta = deadline - now
+        # Разница по UTC epoch не зависит от переходов на летнее время
+        delta = timedelta(seconds=deadline_ts - int(time.time()))
         
         if delta.days > 7:
             return f"📅 {format_time(deadline)}"
@@ -217,10 +737,14 @@ def format_deadline(deadline_str: str) -> str:
         return "📅 Без дедлайна"
 
 # Функция отправки напоминания
-async def send_reminder(user_id: int, task_text: str, reminder_id: str):
+@span("send_reminder")
+async def send_reminder(list_id: int, task_text: str, reminder_id: str):
     try:
-        await bot.send_message(
-            user_id,
+        # Напоминания с одним временем срабатывают одновременно - отправляем в общем темпе
+        await send_limited(
+            outbound,
+            bot.send_message,
+            list_id,
             f"🔔 *Напоминание!*\n\nЗадача: *{task_text}*\n\n"
             f"Не забудьте выполнить задачу!",
             parse_mode="Markdown"
@@ -228,66 +752,161 @@ async def send_reminder(user_id: int, task_text: str, reminder_id: str):
         
         # Удаляем напоминание из хранилища
         if reminder_id in reminders_storage:
-            del reminders_storage[reminder_id]
-            save_data()
+            delete_reminder(reminder_id)
+            save_data(list_id)
             
     except Exception as e:
         print(f"Ошибка при отправке напоминания: {e}")
 
+# Планирование отправки напоминания
+def schedule_reminder(reminder_id: str, reminder: Dict):
+    from apscheduler.triggers.date import DateTrigger
+    
+    get_scheduler().add_job(
+        send_reminder,
+        trigger=DateTrigger(run_date=datetime.fromtimestamp(reminder['reminder_time'], timezone.utc)),
+        args=[reminder['user_id'], reminder['task_text'], reminder_id],
+        id=reminder_id,
+        replace_existing=True
+    )
+
 # Функция для создания напоминания
-def create_reminder(user_id: int, task_index: int, reminder_time: datetime, task_text: str):
-    reminder_id = f"{user_id}_{task_index}_{reminder_time.timestamp()}"
+def create_reminder(list_id: int, task_index: int, reminder_time: datetime, task_text: str):
+    reminder_ts = to_epoch(reminder_time)
+    reminder_id = f"{list_id}_{task_index}_{reminder_ts}"
     
     # Сохраняем напоминание
     reminders_storage[reminder_id] = {
-        'user_id': user_id,
+        # user_id - чат, в который придет напоминание (чат списка)
+        'user_id': list_id,
         'task_index': task_index,
-        'reminder_time': reminder_time.isoformat(),
+        'reminder_time': reminder_ts,
         'task_text': task_text
     }
+    bisect.insort(reminder_index, (reminder_ts, reminder_id))
     
-    # Планируем отправку
-    scheduler.add_job(
-        send_reminder,
-        trigger=DateTrigger(run_date=reminder_time),
-        args=[user_id, task_text, reminder_id],
-        id=reminder_id
-    )
+    # Планируем отправку; дальние напоминания запланирует refill_scheduled_reminders
+    if reminder_ts < scheduled_until:
+        schedule_reminder(reminder_id, reminders_storage[reminder_id])
     
-    save_data()
+    save_data(list_id)
     return reminder_id
 
-# Загрузка и планирование существующих напоминаний при старте
-def load_and_schedule_reminders():
-    for reminder_id, reminder_data in list(reminders_storage.items()):
-        try:
-            reminder_time = datetime.fromisoformat(reminder_data['reminder_time'])
+# Задержка запуска заданий планировщиком относительно запланированного времени.
+# Считается в момент передачи задания исполнителю: EVENT_JOB_EXECUTED приходит
+# после завершения корутины и включал бы ожидание очереди отправки и HTTP-запрос
+def on_scheduler_job_event(event):
+    if profiler.enabled and event.scheduled_run_times:
+        scheduled = event.scheduled_run_times[0]
+        delay = datetime.now(scheduled.tzinfo) - scheduled
+        profiler.record("scheduler.dispatch_delay", delay.total_seconds(), 0)
+
+# Удаление задач из списка пользователя с переносом индексов в напоминаниях
+def remove_tasks(list_id: int, removed: List[Dict]):
+    removed_ids = {id(task) for task in removed}
+    old_tasks = tasks_storage.get(list_id, [])
+    
+    new_indexes = {}
+    kept_tasks = []
+    for index, task in enumerate(old_tasks):
+        if id(task) not in removed_ids:
+            new_indexes[index] = len(kept_tasks)
+            kept_tasks.append(task)
+    tasks_storage[list_id] = kept_tasks
+    
+    for reminder_id, reminder in list(reminders_storage.items()):
+        if reminder['user_id'] != list_id:
+            continue
+        if reminder['task_index'] in new_indexes:
+            reminder['task_index'] = new_indexes[reminder['task_index']]
+        else:
+            delete_reminder(reminder_id)
+
+# Перенос давно выполненных задач в архив
+async def archive_completed_tasks():
+    archived_total = 0
+    
+    for list_id in list(tasks_storage):
+        # Блокировка чата: пока задачи пишутся в архив, пользователь не может
+        # снова открыть или изменить их (обработчики ждут ту же блокировку)
+        async with user_locks.hold(list_id):
+            # completed_at записано во времени пользователя
+            cutoff = user_now(list_id).replace(tzinfo=None) - timedelta(days=ARCHIVE_AFTER_DAYS)
+            to_archive = [
+                task for task in tasks_storage.get(list_id, [])
+                if task['completed'] and task.get('completed_at')
+                and datetime.strptime(task['completed_at'], "%Y-%m-%d %H:%M") < cutoff
+            ]
+            if not to_archive:
+                continue
             
-            if reminder_time > datetime.now():
-                scheduler.add_job(
-                    send_reminder,
-                    trigger=DateTrigger(run_date=reminder_time),
-                    args=[reminder_data['user_id'], 
-                          reminder_data['task_text'], 
-                          reminder_id],
-                    id=reminder_id
-                )
-            else:
-                # Удаляем просроченные напоминания
-                del reminders_storage[reminder_id]
+            # Сначала пишем в архив, затем удаляем из активного списка
+            archived_at = user_now(list_id).strftime("%Y-%m-%d %H:%M")
+            records = [dict(task, archived_at=archived_at) for task in to_archive]
+            await asyncio.to_thread(archive.append, list_id, records)
+            
+            remove_tasks(list_id, to_archive)
+            save_data(list_id)
+            archived_total += len(to_archive)
+    
+    if archived_total:
+        print(f"Перенесено в архив задач: {archived_total}")
+
+# Передача планировщику напоминаний, срабатывающих в пределах горизонта
+def schedule_due_reminders() -> int:
+    global scheduled_until
+    horizon_end = int(time.time()) + REMINDER_HORIZON_MINUTES * 60
+    
+    due = reminders_between(scheduled_until, horizon_end)
+    for reminder_id in due:
+        try:
+            schedule_reminder(reminder_id, reminders_storage[reminder_id])
         except Exception as e:
-            print(f"Ошибка при загрузке напоминания: {e}")
+            print(f"Ошибка при планировании напоминания: {e}")
     
-    save_data()
+    scheduled_until = max(scheduled_until, horizon_end)
+    return len(due)
+
+# Регулярный перенос напоминаний из индекса в планировщик
+async def refill_scheduled_reminders():
+    schedule_due_reminders()
+
+# Загрузка и планирование существующих напоминаний при старте.
+# Вызывается до scheduler.start(): задания добавляются пачкой без пересчета расписания,
+# а данные сохраняются только если были удалены просроченные напоминания.
+# Планировщику передаются только ближайшие напоминания - это дешевле, чем
+# создавать задание APScheduler на каждое напоминание.
+def load_and_schedule_reminders() -> int:
+    global scheduled_until
+    now_ts = int(time.time())
+    
+    # Просроченные напоминания - начало индекса до текущего момента
+    expired = reminders_between(0, now_ts + 1)
+    for reminder_id in expired:
+        delete_reminder(reminder_id)
+    
+    scheduled_until = now_ts + 1
+    schedule_due_reminders()
+    
+    if expired:
+        save_data()
+    
+    return len(reminders_storage)
 
 # Команда /start
 @dp.message(Command("start"))
 async def cmd_start(message: types.Message):
-    user_id = message.from_user.id
+    list_id = message.chat.id
     
-    if user_id not in tasks_storage:
-        tasks_storage[user_id] = []
-        save_data()
+    if list_id not in tasks_storage:
+        tasks_storage[list_id] = []
+        save_data(list_id)
+    
+    # Запись в таблице users нужна для /broadcast и /admin_stats
+    try:
+        await register_user(message.from_user)
+    except Exception as e:
+        print(f"Ошибка регистрации пользователя: {e}")
     
     welcome_text = (
         "📝 *To-Do List Bot с напоминаниями*\n\n"
@@ -297,6 +916,10 @@ async def cmd_start(message: types.Message):
         "/list - Показать все задачи\n"
         "/deadlines - Показать задачи с дедлайнами\n"
         "/reminders - Показать активные напоминания\n"
+        "/stats - Статистика\n"
+        "/archive - Архив выполненных задач\n"
+        "/timezone - Часовой пояс\n"
+        "/join - Общий список группы\n"
         "/help - Помощь\n\n"
         "*Быстрые действия:*\n"
         "• Отправьте текст задачи, чтобы добавить\n"
@@ -318,10 +941,25 @@ async def cmd_help(message: types.Message):
         "• `через 2 часа`\n"
         "• `через 30 минут`\n"
         "• `15:30` (сегодня)\n\n"
+        "*Быстрое добавление:*\n"
+        "Просто отправьте задачу одним сообщением:\n"
+        "`сдать отчёт завтра в 18:00 напомни за час`\n\n"
+        "*Несколько задач сразу:*\n"
+        "После /add отправьте список, по задаче на строку:\n"
+        "`купить молоко — завтра в 10:00`\n"
+        "`позвонить маме`\n\n"
+        "*Группы:*\n"
+        "В групповом чате у бота один список на всех. Участники (/join) "
+        "получают сводки изменений в личные сообщения.\n\n"
         "*Команды:*\n"
         "/add - Добавить задачу\n"
         "/deadlines - Задачи с дедлайнами\n"
         "/reminders - Мои напоминания\n"
+        "/stats - Моя статистика\n"
+        "/archive - Архив выполненных задач\n"
+        "/timezone - Мой часовой пояс\n"
+        "/join, /leave - Участие в общем списке группы\n"
+        "/lists - Мои общие списки\n"
         "/clear - Очистить выполненные\n"
         "/help - Эта справка"
     )
@@ -336,13 +974,20 @@ async def cmd_add(message: types.Message, state: FSMContext):
 # Обработка текста задачи
 @dp.message(TaskStates.waiting_for_task)
 async def process_task_text(message: types.Message, state: FSMContext):
-    user_id = message.from_user.id
+    list_id = message.chat.id
     task_text = message.text.strip()
     
     if not task_text:
         await message.answer("❌ Текст задачи не может быть пустым!")
         return
     
+    # Несколько строк - пакетное добавление, каждая строка становится задачей
+    lines = [line for line in task_text.splitlines() if line.strip()]
+    if len(lines) > 1:
+        await add_tasks_batch(message, lines)
+        await state.clear()
+        return
+    
     await state.update_data(task_text=task_text)
     
     # Предлагаем установить дедлайн
@@ -360,28 +1005,72 @@ async def process_task_text(message: types.Message, state: FSMContext):
         reply_markup=keyboard
     )
 
+# Пакетное добавление задач: одна запись в хранилище и один ответ
+async def add_tasks_batch(message: types.Message, lines: List[str]):
+    list_id = message.chat.id
+    zone = get_user_zone(list_id)
+    
+    new_tasks = []
+    # id задач, у которых время не принято и дедлайн не установлен
+    dropped = set()
+    for line in lines:
+        text, deadline, deadline_dropped = parse_task_line(line, zone)
+        if text:
+            new_tasks.append(make_task(list_id, text, deadline))
+            if deadline_dropped:
+                dropped.add(id(new_tasks[-1]))
+    
+    if not new_tasks:
+        await message.answer("❌ Текст задачи не может быть пустым!")
+        return
+    
+    tasks_storage.setdefault(list_id, []).extend(new_tasks)
+    for task in new_tasks:
+        record_task_created(list_id, task)
+    save_data(list_id)
+    notify_members(list_id, message.from_user, f"добавлено задач: {len(new_tasks)}")
+    
+    summary_text = f"✅ Добавлено задач: *{len(new_tasks)}*\n\n"
+    for i, task in enumerate(new_tasks[:BATCH_SUMMARY_LIMIT], 1):
+        summary_text += f"{i}. {task['text'][:40]}"
+        if task['deadline']:
+            summary_text += f" - 📅 {format_time(from_epoch(task['deadline'], list_id))}"
+        elif id(task) in dropped:
+            summary_text += " - ⚠️ без дедлайна"
+        summary_text += "\n"
+    
+    if len(new_tasks) > BATCH_SUMMARY_LIMIT:
+        summary_text += f"... и еще {len(new_tasks) - BATCH_SUMMARY_LIMIT}\n"
+    
+    if dropped:
+        summary_text += (
+            f"\n⚠️ Время не распознано или уже прошло, задачи добавлены без дедлайна: {len(dropped)}. "
+            "Его можно установить в карточке задачи.\n"
+        )
+    
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="📋 Список задач", callback_data="show_all_tasks")]
+    ])
+    
+    await message.answer(summary_text, parse_mode="Markdown", reply_markup=keyboard)
+
 # Обработка добавления дедлайна
 @dp.callback_query(F.data.in_(["add_deadline", "skip_deadline"]))
 async def process_deadline_choice(callback: types.CallbackQuery, state: FSMContext):
     if callback.data == "skip_deadline":
         # Создаем задачу без дедлайна
         data = await state.get_data()
-        user_id = callback.from_user.id
-        
-        if user_id not in tasks_storage:
-            tasks_storage[user_id] = []
-        
-        new_task = {
-            'text': data['task_text'],
-            'completed': False,
-            'created_at': datetime.now().strftime("%Y-%m-%d %H:%M"),
-            'completed_at': None,
-            'deadline': None,
-            'reminders': []
-        }
+        list_id = callback.message.chat.id
         
-        tasks_storage[user_id].append(new_task)
-        save_data()
+        if list_id not in tasks_storage:
+            tasks_storage[list_id] = []
+        
+        new_task = make_task(list_id, data['task_text'])
+        
+        tasks_storage[list_id].append(new_task)
+        record_task_created(list_id, new_task)
+        save_data(list_id)
+        notify_members(list_id, callback.from_user, f"добавлена задача «{new_task['text']}»")
         
         await callback.message.edit_text(
             f"✅ Задача добавлена: *{data['task_text']}*\n"
@@ -410,13 +1099,13 @@ async def process_deadline_choice(callback: types.CallbackQuery, state: FSMConte
 # Обработка дедлайна
 @dp.message(TaskStates.waiting_for_deadline)
 async def process_deadline_text(message: types.Message, state: FSMContext):
-    user_id = message.from_user.id
+    list_id = message.chat.id
     deadline_text = message.text.strip()
     
     data = await state.get_data()
     task_text = data['task_text']
     
-    deadline = parse_time(deadline_text)
+    deadline = parse_time(deadline_text, get_user_zone(list_id))
     
     if not deadline:
         await message.answer(
@@ -430,22 +1119,17 @@ async def process_deadline_text(message: types.Message, state: FSMContext):
         )
         return
     
-    if user_id not in tasks_storage:
-        tasks_storage[user_id] = []
+    if list_id not in tasks_storage:
+        tasks_storage[list_id] = []
     
-    new_task = {
-        'text': task_text,
-        'completed': False,
-        'created_at': datetime.now().strftime("%Y-%m-%d %H:%M"),
-        'completed_at': None,
-        'deadline': deadline.isoformat(),
-        'reminders': []
-    }
+    new_task = make_task(list_id, task_text, deadline)
     
-    tasks_storage[user_id].append(new_task)
-    save_data()
+    tasks_storage[list_id].append(new_task)
+    record_task_created(list_id, new_task)
+    save_data(list_id)
     
     deadline_formatted = format_time(deadline)
+    notify_members(list_id, message.from_user, f"добавлена задача «{task_text}» (до {deadline_formatted})")
     await message.answer(
         f"✅ Задача добавлена: *{task_text}*\n"
         f"📅 Дедлайн: *{deadline_formatted}*",
@@ -453,7 +1137,7 @@ async def process_deadline_text(message: types.Message, state: FSMContext):
     )
     
     # Предлагаем установить напоминание
-    task_index = len(tasks_storage[user_id]) - 1
+    task_index = len(tasks_storage[list_id]) - 1
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
             InlineKeyboardButton(text="🔔 Напоминание", callback_data=f"set_reminder_{task_index}"),
@@ -476,27 +1160,27 @@ async def cmd_list(message: types.Message):
 # Команда /deadlines
 @dp.message(Command("deadlines"))
 async def cmd_deadlines(message: types.Message):
-    user_id = message.from_user.id
+    list_id = message.chat.id
     
-    if user_id not in tasks_storage or not tasks_storage[user_id]:
+    if list_id not in tasks_storage or not tasks_storage[list_id]:
         await message.answer("📭 У вас нет задач с дедлайнами!")
         return
     
-    tasks_with_deadlines = [task for task in tasks_storage[user_id] 
+    tasks_with_deadlines = [task for task in tasks_storage[list_id] 
                            if task.get('deadline') and not task['completed']]
     
     if not tasks_with_deadlines:
         await message.answer("📭 Нет активных задач с дедлайнами!")
         return
     
-    tasks_with_deadlines.sort(key=lambda x: datetime.fromisoformat(x['deadline']))
+    tasks_with_deadlines.sort(key=lambda x: x['deadline'])
     
     list_text = "⏰ *Задачи с дедлайнами:*\n\n"
+    now_ts = int(time.time())
     
     for i, task in enumerate(tasks_with_deadlines, 1):
-        deadline = datetime.fromisoformat(task['deadline'])
-        deadline_str = format_deadline(task['deadline'])
-        time_left = deadline - datetime.now()
+        deadline_str = format_deadline(task['deadline'], list_id)
+        time_left = timedelta(seconds=task['deadline'] - now_ts)
         
         list_text += f"{i}. *{task['text']}*\n"
         list_text += f"   {deadline_str}\n"
@@ -516,12 +1200,12 @@ async def cmd_deadlines(message: types.Message):
 # Команда /reminders
 @dp.message(Command("reminders"))
 async def cmd_reminders(message: types.Message):
-    user_id = message.from_user.id
+    list_id = message.chat.id
     
     user_reminders = [
         (reminder_id, reminder) 
         for reminder_id, reminder in reminders_storage.items()
-        if reminder['user_id'] == user_id
+        if reminder['user_id'] == list_id
     ]
     
     if not user_reminders:
@@ -532,8 +1216,8 @@ async def cmd_reminders(message: types.Message):
     
     for reminder_id, reminder in user_reminders:
         try:
-            reminder_time = datetime.fromisoformat(reminder['reminder_time'])
-            time_left = reminder_time - datetime.now()
+            reminder_time = from_epoch(reminder['reminder_time'], list_id)
+            time_left = timedelta(seconds=reminder['reminder_time'] - int(time.time()))
             
             list_text += f"• *{reminder['task_text']}*\n"
             list_text += f"  🕐 {format_time(reminder_time)}\n"
@@ -558,14 +1242,43 @@ async def cmd_reminders(message: types.Message):
     
     await message.answer(list_text, parse_mode="Markdown", reply_markup=keyboard)
 
+# Команда /stats
+@dp.message(Command("stats"))
+async def cmd_stats(message: types.Message):
+    await message.answer(format_user_stats(message.chat.id), parse_mode="Markdown")
+
+# Еженедельный отчет для пользователей, у которых была активность за неделю
+async def send_weekly_reports():
+    for list_id, stats in list(stats_storage.items()):
+        _, week_key = stats_period_keys(user_now(list_id) - timedelta(days=7))
+        week = stats['weeks'].get(week_key)
+        if not week or not (week['created'] or week['completed']):
+            continue
+        
+        report_text = "🗓 *Итоги недели*\n\n"
+        report_text += f"Создано задач: *{week['created']}*\n"
+        report_text += f"Выполнено: *{week['completed']}*\n"
+        if week['completed']:
+            average = week['latency_total'] // week['completed']
+            report_text += f"Среднее время выполнения: *{format_duration(average)}*\n"
+        overdue = count_overdue(list_id)
+        if overdue:
+            report_text += f"Просрочено сейчас: *{overdue}*\n"
+        
+        try:
+            # Отчеты уходят всем сразу - в общем темпе исходящих сообщений
+            await send_limited(outbound, bot.send_message, list_id, report_text, parse_mode="Markdown")
+        except Exception as e:
+            print(f"Ошибка при отправке недельного отчета: {e}")
+
 # Показать детали задачи
 @dp.callback_query(F.data.startswith("view_task_"))
 async def view_task_details(callback: types.CallbackQuery):
-    user_id = callback.from_user.id
+    list_id = callback.message.chat.id
     task_index = int(callback.data.split("_")[2])
     
-    if user_id in tasks_storage and 0 <= task_index < len(tasks_storage[user_id]):
-        task = tasks_storage[user_id][task_index]
+    if list_id in tasks_storage and 0 <= task_index < len(tasks_storage[list_id]):
+        task = tasks_storage[list_id][task_index]
         
         details_text = f"📋 *Детали задачи*\n\n"
         details_text += f"*Задача:* {task['text']}\n"
@@ -573,7 +1286,7 @@ async def view_task_details(callback: types.CallbackQuery):
         details_text += f"*Создана:* {task['created_at']}\n"
         
         if task.get('deadline'):
-            deadline_str = format_deadline(task['deadline'])
+            deadline_str = format_deadline(task['deadline'], list_id)
             details_text += f"*Дедлайн:* {deadline_str}\n"
         
         if task.get('completed_at'):
@@ -582,16 +1295,16 @@ async def view_task_details(callback: types.CallbackQuery):
         # Показываем напоминания для этой задачи
         task_reminders = [
             reminder for reminder_id, reminder in reminders_storage.items()
-            if reminder['user_id'] == user_id and reminder['task_index'] == task_index
+            if reminder['user_id'] == list_id and reminder['task_index'] == task_index
         ]
         
         if task_reminders:
             details_text += "\n*🔔 Напоминания:*\n"
             for reminder in task_reminders:
-                reminder_time = datetime.fromisoformat(reminder['reminder_time'])
+                reminder_time = from_epoch(reminder['reminder_time'], list_id)
                 details_text += f"• {format_time(reminder_time)}\n"
         
-        keyboard = create_tasks_keyboard(user_id, task_index)
+        keyboard = create_tasks_keyboard(list_id, task_index)
         await callback.message.edit_text(details_text, parse_mode="Markdown", reply_markup=keyboard)
     else:
         await callback.answer("Задача не найдена!")
@@ -600,7 +1313,7 @@ async def view_task_details(callback: types.CallbackQuery):
 @dp.callback_query(F.data.startswith("set_deadline_"))
 async def set_existing_deadline(callback: types.CallbackQuery, state: FSMContext):
     task_index = int(callback.data.split("_")[2])
-    user_id = callback.from_user.id
+    list_id = callback.message.chat.id
     
     await state.update_data(task_index=task_index)
     
@@ -620,26 +1333,30 @@ async def set_existing_deadline(callback: types.CallbackQuery, state: FSMContext
 # Обработка изменения дедлайна
 @dp.message(TaskStates.waiting_for_deadline_edit)
 async def process_deadline_edit(message: types.Message, state: FSMContext):
-    user_id = message.from_user.id
+    list_id = message.chat.id
     deadline_text = message.text.strip()
     
     data = await state.get_data()
     task_index = data['task_index']
     
-    if user_id in tasks_storage and 0 <= task_index < len(tasks_storage[user_id]):
-        deadline = parse_time(deadline_text)
+    if list_id in tasks_storage and 0 <= task_index < len(tasks_storage[list_id]):
+        deadline = parse_time(deadline_text, get_user_zone(list_id))
         
         if not deadline:
             await message.answer("❌ Не удалось распознать время. Попробуйте еще раз.")
             return
         
-        tasks_storage[user_id][task_index]['deadline'] = deadline.isoformat()
-        save_data()
+        tasks_storage[list_id][task_index]['deadline'] = to_epoch(deadline)
+        save_data(list_id)
         
         deadline_formatted = format_time(deadline)
+        notify_members(
+            list_id, message.from_user,
+            f"новый дедлайн «{tasks_storage[list_id][task_index]['text']}»: {deadline_formatted}"
+        )
         await message.answer(
             f"✅ Дедлайн обновлен!\n"
-            f"Задача: *{tasks_storage[user_id][task_index]['text']}*\n"
+            f"Задача: *{tasks_storage[list_id][task_index]['text']}*\n"
             f"Новый дедлайн: *{deadline_formatted}*",
             parse_mode="Markdown"
         )
@@ -663,10 +1380,10 @@ async def process_deadline_edit(message: types.Message, state: FSMContext):
 @dp.callback_query(F.data.startswith("set_reminder_"))
 async def set_reminder(callback: types.CallbackQuery, state: FSMContext):
     task_index = int(callback.data.split("_")[2])
-    user_id = callback.from_user.id
+    list_id = callback.message.chat.id
     
-    if user_id in tasks_storage and 0 <= task_index < len(tasks_storage[user_id]):
-        task = tasks_storage[user_id][task_index]
+    if list_id in tasks_storage and 0 <= task_index < len(tasks_storage[list_id]):
+        task = tasks_storage[list_id][task_index]
         
         await state.update_data(task_index=task_index, task_text=task['text'])
         
@@ -689,19 +1406,19 @@ async def set_reminder(callback: types.CallbackQuery, state: FSMContext):
 # Обработка напоминания
 @dp.message(TaskStates.waiting_for_reminder)
 async def process_reminder_text(message: types.Message, state: FSMContext):
-    user_id = message.from_user.id
+    list_id = message.chat.id
     reminder_text = message.text.strip()
     
     data = await state.get_data()
     task_index = data['task_index']
     task_text = data['task_text']
     
-    if user_id in tasks_storage and 0 <= task_index < len(tasks_storage[user_id]):
-        reminder_time = parse_time(reminder_text)
+    if list_id in tasks_storage and 0 <= task_index < len(tasks_storage[list_id]):
+        reminder_time = parse_time(reminder_text, get_user_zone(list_id))
         
         # Если не указано явное время, используем дедлайн минус 30 минут
-        if not reminder_time and tasks_storage[user_id][task_index].get('deadline'):
-            deadline = datetime.fromisoformat(tasks_storage[user_id][task_index]['deadline'])
+        if not reminder_time and tasks_storage[list_id][task_index].get('deadline'):
+            deadline = from_epoch(tasks_storage[list_id][task_index]['deadline'], list_id)
             reminder_time = deadline - timedelta(minutes=30)
         
         if not reminder_time:
@@ -709,7 +1426,7 @@ async def process_reminder_text(message: types.Message, state: FSMContext):
             return
         
         # Создаем напоминание
-        reminder_id = create_reminder(user_id, task_index, reminder_time, task_text)
+        reminder_id = create_reminder(list_id, task_index, reminder_time, task_text)
         
         await message.answer(
             f"🔔 Напоминание установлено!\n"
@@ -723,25 +1440,19 @@ async def process_reminder_text(message: types.Message, state: FSMContext):
 # Удаление всех напоминаний
 @dp.callback_query(F.data == "clear_all_reminders")
 async def clear_all_reminders(callback: types.CallbackQuery):
-    user_id = callback.from_user.id
+    list_id = callback.message.chat.id
     
     # Находим все напоминания пользователя
     user_reminder_ids = [
         reminder_id for reminder_id, reminder in reminders_storage.items()
-        if reminder['user_id'] == user_id
+        if reminder['user_id'] == list_id
     ]
     
-    # Удаляем из планировщика
+    # Удаляем из хранилища и планировщика
     for reminder_id in user_reminder_ids:
-        try:
-            scheduler.remove_job(reminder_id)
-        except Exception:
-            pass
-        
-        if reminder_id in reminders_storage:
-            del reminders_storage[reminder_id]
+        delete_reminder(reminder_id)
     
-    save_data()
+    save_data(list_id)
     
     await callback.message.edit_text("✅ Все напоминания удалены!")
     await callback.answer()
@@ -753,14 +1464,15 @@ async def show_all_tasks_callback(callback: types.CallbackQuery):
     await callback.answer()
 
 # Функция для показа списка задач
+@span("show_task_list")
 async def show_task_list(message: types.Message):
-    user_id = message.from_user.id
+    list_id = message.chat.id
     
-    if user_id not in tasks_storage or not tasks_storage[user_id]:
+    if list_id not in tasks_storage or not tasks_storage[list_id]:
         await message.answer("📭 Ваш список задач пуст!\nОтправьте мне текст, чтобы добавить первую задачу.")
         return
     
-    tasks = tasks_storage[user_id]
+    tasks = tasks_storage[list_id]
     
     # Разделяем задачи на выполненные и активные
     active_tasks = [task for task in tasks if not task['completed']]
@@ -775,7 +1487,7 @@ async def show_task_list(message: types.Message):
             deadline_str = ""
             
             if task.get('deadline'):
-                deadline_str = f" - {format_deadline(task['deadline'])}"
+                deadline_str = f" - {format_deadline(task['deadline'], list_id)}"
             
             list_text += f"{i}. {icon} {task['text'][:40]}{deadline_str}\n"
     
@@ -784,44 +1496,43 @@ async def show_task_list(message: types.Message):
         for i, task in enumerate(completed_tasks, 1):
             list_text += f"{i}. ✅ {task['text'][:40]}\n"
     
-    keyboard = create_tasks_keyboard(user_id)
+    keyboard = create_tasks_keyboard(list_id)
     await message.answer(list_text, parse_mode="Markdown", reply_markup=keyboard)
 
 # Обработка нажатия на задачу (отметка выполнения)
 @dp.callback_query(F.data.startswith("task_"))
 async def process_task_click(callback: types.CallbackQuery):
-    user_id = callback.from_user.id
+    list_id = callback.message.chat.id
     task_index = int(callback.data.split("_")[1])
     
-    if user_id in tasks_storage and 0 <= task_index < len(tasks_storage[user_id]):
-        task = tasks_storage[user_id][task_index]
+    if list_id in tasks_storage and 0 <= task_index < len(tasks_storage[list_id]):
+        task = tasks_storage[list_id][task_index]
         
         # Меняем статус задачи
         task['completed'] = not task['completed']
         
         if task['completed']:
-            task['completed_at'] = datetime.now().strftime("%Y-%m-%d %H:%M")
+            task['completed_at'] = user_now(list_id).strftime("%Y-%m-%d %H:%M")
+            record_task_completed(list_id, task)
             
             # Удаляем напоминания для выполненной задачи
             reminder_ids = [
                 reminder_id for reminder_id, reminder in reminders_storage.items()
-                if reminder['user_id'] == user_id and reminder['task_index'] == task_index
+                if reminder['user_id'] == list_id and reminder['task_index'] == task_index
             ]
             
             for reminder_id in reminder_ids:
-                try:
-                    scheduler.remove_job(reminder_id)
-                except Exception:
-                    pass
-                
-                if reminder_id in reminders_storage:
-                    del reminders_storage[reminder_id]
-            
-            save_data()
+                delete_reminder(reminder_id)
         else:
+            if task.get('completed_at'):
+                record_task_reopened(list_id, task)
             task['completed_at'] = None
         
-        save_data()
+        save_data(list_id)
+        notify_members(
+            list_id, callback.from_user,
+            f"{'выполнена' if task['completed'] else 'снова в работе'} задача «{task['text']}»"
+        )
         
         await callback.answer(f"Задача отмечена как {'выполненная' if task['completed'] else 'невыполненная'}!")
         
@@ -840,44 +1551,602 @@ async def process_add_task(callback: types.CallbackQuery, state: FSMContext):
 # Обработка кнопки "Очистить выполненные"
 @dp.callback_query(F.data == "clear_completed")
 async def process_clear_completed(callback: types.CallbackQuery):
-    user_id = callback.from_user.id
+    list_id = callback.message.chat.id
     
-    if user_id in tasks_storage:
+    if list_id in tasks_storage:
         # Удаляем только выполненные задачи
-        initial_count = len(tasks_storage[user_id])
-        tasks_storage[user_id] = [task for task in tasks_storage[user_id] if not task['completed']]
-        removed_count = initial_count - len(tasks_storage[user_id])
+        completed_tasks = [task for task in tasks_storage[list_id] if task['completed']]
+        remove_tasks(list_id, completed_tasks)
+        save_data(list_id)
+        if completed_tasks:
+            notify_members(list_id, callback.from_user, f"удалено выполненных задач: {len(completed_tasks)}")
+        
+        await callback.answer(f"Удалено выполненных задач: {len(completed_tasks)}")
+        await show_task_list(callback.message)
+    else:
+        await callback.answer()
 
-# В начале файла импортируем необходимые модули
-from database.database import create_tables, async_session
-from database.crud import get_or_create_user, create_task, get_user_tasks
+# Текст и клавиатура страницы архива
+async def render_archive_page(list_id: int, page: int) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    tasks, total = await asyncio.to_thread(archive.page, list_id, page, ARCHIVE_PAGE_SIZE)
+    
+    if not total:
+        return "🗄 Архив пуст.", None
+    
+    pages = (total + ARCHIVE_PAGE_SIZE - 1) // ARCHIVE_PAGE_SIZE
+    archive_text = f"🗄 *Архив* (стр. {page + 1}/{pages}, всего {total})\n\n"
+    for i, task in enumerate(tasks, page * ARCHIVE_PAGE_SIZE + 1):
+        archive_text += f"{i}. ✅ {task['text'][:40]} - {task['completed_at']}\n"
+    
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"archive_page_{page - 1}"))
+    if page + 1 < pages:
+        buttons.append(InlineKeyboardButton(text="Вперед ➡️", callback_data=f"archive_page_{page + 1}"))
+    
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+    return archive_text, keyboard
 
-# При старте бота создаем таблицы
-async def on_startup():
+# Команда /archive
+@dp.message(Command("archive"))
+async def cmd_archive(message: types.Message):
+    archive_text, keyboard = await render_archive_page(message.chat.id, 0)
+    await message.answer(archive_text, parse_mode="Markdown", reply_markup=keyboard)
+
+# Переключение страниц архива
+@dp.callback_query(F.data.startswith("archive_page_"))
+async def process_archive_page(callback: types.CallbackQuery):
+    page = int(callback.data.split("_")[2])
+    archive_text, keyboard = await render_archive_page(callback.message.chat.id, page)
+    await callback.message.edit_text(archive_text, parse_mode="Markdown", reply_markup=keyboard)
+    await callback.answer()
+
+# Команда /join - вступить в общий список группового чата
+@dp.message(Command("join"))
+async def cmd_join(message: types.Message):
+    if message.chat.type == "private":
+        await message.answer("👥 Общие списки ведутся в групповых чатах: добавьте бота в группу и отправьте /join там.")
+        return
+    
+    if join_list(message.chat.id, message.chat.title, message.from_user.id):
+        await message.answer(
+            f"👥 {message.from_user.full_name} теперь участник списка.\n"
+            "Сводки изменений будут приходить в личные сообщения от бота."
+        )
+    else:
+        await message.answer("👥 Вы уже участник этого списка.")
+
+# Команда /leave - выйти из общего списка группового чата
+@dp.message(Command("leave"))
+async def cmd_leave(message: types.Message):
+    if leave_list(message.chat.id, message.from_user.id):
+        await message.answer(f"👋 {message.from_user.full_name} больше не получает сводки этого списка.")
+    else:
+        await message.answer("Вы не участник этого списка.")
+
+# Команда /lists - общие списки пользователя
+@dp.message(Command("lists"))
+async def cmd_lists(message: types.Message):
+    list_ids = member_lists.get(message.from_user.id)
+    if not list_ids:
+        await message.answer("👥 Вы не участвуете в общих списках.\nОтправьте /join в групповом чате с ботом.")
+        return
+    
+    lists_text = "👥 Ваши общие списки:\n\n"
+    for list_id in sorted(list_ids):
+        tasks = tasks_storage.get(list_id, [])
+        active = sum(1 for task in tasks if not task['completed'])
+        lists_text += f"• {lists_storage[list_id]['title']}: активных задач {active}, участников {len(list_members[list_id])}\n"
+    
+    await message.answer(lists_text)
+
+# Модули базы данных, резервного копирования и рассылок импортируются в функциях,
+# которые их используют: SQLAlchemy не нужен для импорта бота с JSON-хранилищем
+
+# Кэш пользователей, прогреваемый после старта
+users_cache: Dict[int, "User"] = {}
+# Фоновая часть запуска (см. finish_startup)
+startup_task: Optional[asyncio.Task] = None
+# Текущая рассылка /broadcast
+broadcast_task: Optional[asyncio.Task] = None
+
+# Создание таблиц и загрузка часовых поясов (до них апдейты не обрабатываются)
+async def init_database():
+    from database.crud import get_user_timezones
+    from database.database import async_session, create_tables
+    
     await create_tables()
-    print("База данных инициализирована")
+    
+    async with async_session() as session:
+        user_timezones.update(await get_user_timezones(session))
 
-# Пример обновленной команды /start
-@dp.message(Command("start"))
-async def cmd_start(message: types.Message):
-    user_id = message.from_user.id
-    username = message.from_user.username
-    full_name = message.from_user.full_name
+# Прогрев кэша недавно активных пользователей; выполняется после старта
+async def warm_users_cache():
+    from database.crud import get_recently_active_users
+    from database.database import async_session
+    
+    async with async_session() as session:
+        users = await get_recently_active_users(
+            session, datetime.now() - timedelta(days=RECENT_USERS_DAYS)
+        )
+    
+    for user in users:
+        users_cache.setdefault(user.id, user)
+    print(f"Пользователей в кэше: {len(users)}")
+
+# Часть запуска, которая идет параллельно с началом опроса Telegram
+async def finish_startup():
+    started = time.perf_counter()
+    try:
+        if STORAGE_BACKEND != 'sql':
+            await init_database()
+    except Exception as e:
+        print(f"Ошибка инициализации базы данных: {e}")
+    finally:
+        startup_gate.ready.set()
+    print(f"База данных готова за {time.perf_counter() - started:.3f} с")
+    
+    # Первая архивация и прогрев кэша не задерживают обработку апдейтов
+    await archive_completed_tasks()
+    await warm_users_cache()
+
+# При старте бота загружаем данные и планируем напоминания; база данных
+# (для JSON-хранилища), архивация и прогрев кэша - в фоне (finish_startup)
+async def on_startup():
+    global startup_task
+    from apscheduler.triggers.cron import CronTrigger
+    from apscheduler.triggers.interval import IntervalTrigger
+    
+    started = time.perf_counter()
+    
+    if STORAGE_BACKEND == 'sql':
+        # Данные хранятся в той же базе - сначала нужна схема
+        await init_database()
+    await load_data()
+    
+    # Профилирование с момента запуска
+    if os.getenv('PROFILE') == '1':
+        profiler.start()
+    
+    reminders_count = load_and_schedule_reminders()
+    jobs = get_scheduler()
+    
+    # Перенос напоминаний в планировщик по мере приближения их времени
+    jobs.add_job(
+        refill_scheduled_reminders,
+        trigger=IntervalTrigger(minutes=REMINDER_REFILL_MINUTES),
+        id='refill_scheduled_reminders',
+        replace_existing=True
+    )
+    
+    # Архивация выполненных задач каждую ночь (первая - в finish_startup)
+    jobs.add_job(
+        archive_completed_tasks,
+        trigger=CronTrigger(hour=4, timezone=DEFAULT_TIMEZONE),
+        id='archive_completed_tasks',
+        replace_existing=True
+    )
+    
+    # Ежедневная резервная копия
+    jobs.add_job(
+        make_backup,
+        trigger=CronTrigger(hour=3, timezone=DEFAULT_TIMEZONE),
+        id='backup',
+        replace_existing=True
+    )
+    
+    # Еженедельный отчет по понедельникам
+    jobs.add_job(
+        send_weekly_reports,
+        trigger=CronTrigger(day_of_week='mon', hour=10, timezone=DEFAULT_TIMEZONE),
+        id='weekly_reports',
+        replace_existing=True
+    )
+    jobs.start()
+    
+    startup_task = asyncio.create_task(finish_startup())
+    
+    print(f"Бот запущен за {time.perf_counter() - started:.3f} с (напоминаний: {reminders_count})")
+
+# При остановке дожидаемся обработчиков и сохраняем данные
+async def on_shutdown():
+    started = time.perf_counter()
+    
+    if not await inflight.drain(SHUTDOWN_TIMEOUT):
+        print(f"Не дождались завершения обработчиков: {inflight.inflight}")
+    
+    # Рассылку прерываем: она продолжится с контрольной точки при повторном /broadcast
+    if broadcast_task is not None and not broadcast_task.done():
+        broadcast_task.cancel()
+    # Фоновые задачи с открытыми сессиями БД должны завершиться до закрытия пула
+    await asyncio.gather(
+        *(task for task in (broadcast_task, startup_task) if task is not None),
+        return_exceptions=True
+    )
+    
+    # Досылаем накопленные сводки общих списков
+    if not await notifier.drain(SHUTDOWN_TIMEOUT):
+        print("Не все сводки общих списков разосланы")
+    
+    from database.database import dispose_engine
+    
+    if scheduler is not None and scheduler.running:
+        scheduler.shutdown(wait=False)
+    
+    # Дожидаемся записи несохраненных изменений; если изменений нет, ничего не пишется.
+    # Отложенный повтор после ошибки заменяется последней попыткой записи
+    if flush_retry is not None:
+        flush_retry.cancel()
+    schedule_flush()
+    await save_task
+    if dirty_all:
+        print("Не удалось сохранить изменения перед остановкой")
+    await dispose_engine()
+    
+    if profiler.enabled:
+        print(f"Профиль сохранен: {await profiler.dump_async()}")
+        profiler.stop()
+    
+    print(f"Бот остановлен за {time.perf_counter() - started:.3f} с")
+
+# Пользователь из кэша или из базы; новый пользователь создается в таблице users
+async def register_user(from_user: types.User) -> "User":
+    user = users_cache.get(from_user.id)
+    if user:
+        return user
+    
+    from database.crud import get_or_create_user
+    from database.database import async_session
     
     async with async_session() as session:
-        # Создаем или получаем пользователя
         user = await get_or_create_user(
             session=session,
-            user_id=user_id,
-            username=username,
-            full_name=full_name
+            user_id=from_user.id,
+            username=from_user.username,
+            full_name=from_user.full_name
         )
+    users_cache[from_user.id] = user
+    return user
+
+# Команда /admin_stats - сводка по всем пользователям
+@dp.message(Command("admin_stats"))
+async def cmd_admin_stats(message: types.Message):
+    if message.from_user.id not in ADMIN_IDS:
+        return
     
-    welcome_text = (
-        "📝 *To-Do List Bot с базой данных*\n\n"
-        f"Привет, {user.full_name or 'пользователь'}!\n"
-        f"Ваш ID: {user.id}\n"
-        f"Дата регистрации: {user.created_at.strftime('%d.%m.%Y')}"
+    # Сумма инкрементальных счетчиков
+    created = sum(stats['created'] for stats in stats_storage.values())
+    completed = sum(stats['completed'] for stats in stats_storage.values())
+    completed_late = sum(stats['completed_late'] for stats in stats_storage.values())
+    latency_total = sum(stats['latency_total'] for stats in stats_storage.values())
+    overdue = sum(count_overdue(list_id) for list_id in tasks_storage)
+    
+    report_text = "🛠 *Статистика бота*\n\n"
+    report_text += "*По счетчикам:*\n"
+    report_text += f"Пользователей: {len(stats_storage)}\n"
+    report_text += f"Создано задач: {created}\n"
+    report_text += f"Выполнено: {completed}\n"
+    report_text += f"После дедлайна: {completed_late}\n"
+    report_text += f"Просрочено сейчас: {overdue}\n"
+    if completed:
+        report_text += f"Среднее время выполнения: {format_duration(latency_total // completed)}\n"
+    
+    # Таблицу tasks заполняет только sql-хранилище
+    if STORAGE_BACKEND == 'sql':
+        from database.crud import get_global_stats
+        from database.database import async_session
+        
+        # Один агрегирующий проход по базе данных
+        async with async_session() as session:
+            db_stats = await get_global_stats(session)
+        
+        report_text += "\n*По базе данных:*\n"
+        report_text += f"Пользователей: {db_stats['users']}\n"
+        report_text += f"Задач: {db_stats['tasks']}\n"
+        report_text += f"Выполнено: {db_stats['completed']}\n"
+        report_text += f"Просрочено: {db_stats['overdue']}\n"
+        if db_stats['avg_latency_minutes'] is not None:
+            report_text += f"Среднее время выполнения: {format_duration(int(db_stats['avg_latency_minutes']))}\n"
+    
+    lock_metrics = user_locks.metrics
+    report_text += "\n*Блокировки пользователей:*\n"
+    report_text += f"Захватов: {lock_metrics['acquired']}, с ожиданием: {lock_metrics['contended']}\n"
+    if lock_metrics['contended']:
+        average_wait = lock_metrics['wait_total'] / lock_metrics['contended'] * 1000
+        report_text += f"Ожидание: среднее {average_wait:.1f} мс, макс. {lock_metrics['wait_max'] * 1000:.1f} мс\n"
+    report_text += f"Отброшено повторных нажатий: {callback_debounce.suppressed}\n"
+    
+    fanout_metrics = notifier.metrics
+    report_text += "\n*Общие списки:*\n"
+    report_text += f"Списков: {len(lists_storage)}, участников: {len(member_lists)}\n"
+    report_text += (
+        f"Событий: {fanout_metrics['events']}, сводок: {fanout_metrics['digests']}, "
+        f"отправлено: {fanout_metrics['sent']}, ошибок: {fanout_metrics['failed']}\n"
     )
     
-    await message.answer(welcome_text, parse_mode="Markdown")
+    await message.answer(report_text, parse_mode="Markdown")
+
+# Команда /profile on|off|dump - управление профилированием
+@dp.message(Command("profile"))
+async def cmd_profile(message: types.Message):
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    
+    action = (message.text.split(maxsplit=1)[1:] or ['dump'])[0].strip()
+    
+    if action == 'on':
+        profiler.start()
+        await message.answer("🔬 Профилирование включено")
+    elif action == 'off':
+        if profiler.enabled:
+            path = await profiler.dump_async()
+            profiler.stop()
+            await message.answer(f"🔬 Профилирование выключено, результаты: {path}")
+        else:
+            await message.answer("🔬 Профилирование не включено")
+    elif action == 'dump':
+        if profiler.enabled:
+            await message.answer(f"🔬 Результаты сохранены: {await profiler.dump_async()}")
+        else:
+            await message.answer("🔬 Профилирование не включено")
+    else:
+        await message.answer("Использование: /profile on|off|dump")
+
+# Файлы JSON-хранилища в снимке состояния; у sql-хранилища данные в базе
+def state_files() -> Dict[str, str]:
+    if STORAGE_BACKEND != 'json':
+        return {}
+    return {'tasks': DATA_FILE, 'reminders': REMINDERS_FILE, 'stats': STATS_FILE, 'lists': LISTS_FILE}
+
+# Резервная копия без остановки бота: копии файлов хранилища, архива и базы.
+# Сначала записываются накопленные изменения, затем файлы и страницы базы
+# копируются в потоке под save_lock - запись в хранилище ждет только копирования,
+# снимок согласован на этот момент
+async def make_backup() -> List[Dict]:
+    from database import backup
+    from database.database import DB_PATH
+    
+    schedule_flush()
+    await save_task
+    
+    db_copy = None
+    async with save_lock:
+        results = [await asyncio.to_thread(backup.snapshot_state, state_files(), ARCHIVE_DIR, BACKUP_DIR)]
+        if os.path.exists(DB_PATH):
+            db_copy = await asyncio.to_thread(backup.copy_sqlite, DB_PATH, BACKUP_DIR)
+    
+    # Сжатие и контрольная сумма копии базы - уже без блокировки записи
+    if db_copy:
+        results.append(await asyncio.to_thread(backup.finish_sqlite_backup, db_copy))
+    
+    for prefix in (backup.STATE_SNAPSHOT_PREFIX, backup.DB_SNAPSHOT_PREFIX):
+        await asyncio.to_thread(backup.prune_snapshots, BACKUP_DIR, prefix, BACKUP_KEEP)
+    
+    return results
+
+# Восстановление на момент until (или из последних снимков). Снимки проверяются
+# до каких-либо изменений; файлы и база заменяются под save_lock, затем данные
+# заново загружаются из хранилища - несохраненные изменения в памяти отбрасываются
+async def restore_backup(until: Optional[datetime] = None) -> List[str]:
+    global dirty_all, lists_dirty, flush_retry
+    from database import backup
+    from database.database import DB_PATH, dispose_engine
+    
+    state_path = backup.find_snapshot(BACKUP_DIR, backup.STATE_SNAPSHOT_PREFIX, until)
+    db_path = backup.find_snapshot(BACKUP_DIR, backup.DB_SNAPSHOT_PREFIX, until)
+    restored = [path for path in (state_path, db_path) if path]
+    if not restored:
+        return []
+    
+    await asyncio.to_thread(backup.verify_snapshots, restored)
+    
+    async with save_lock:
+        # Снимаем задания текущих напоминаний; восстановленные запланирует load_and_schedule_reminders
+        for reminder_id in list(reminders_storage):
+            delete_reminder(reminder_id)
+        
+        if db_path:
+            # Закрываем соединения пула, чтобы после восстановления они открылись заново
+            await dispose_engine()
+            await asyncio.to_thread(backup.restore_sqlite, db_path, DB_PATH)
+            users_cache.clear()
+        if state_path:
+            await asyncio.to_thread(backup.restore_state, state_path, state_files(), ARCHIVE_DIR)
+        
+        dirty_all = False
+        lists_dirty = False
+        dirty_lists.clear()
+        if flush_retry is not None:
+            flush_retry.cancel()
+            flush_retry = None
+        
+        await init_database()
+        await load_data()
+        load_and_schedule_reminders()
+    
+    return restored
+
+# Команда /backup - резервная копия
+@dp.message(Command("backup"))
+async def cmd_backup(message: types.Message):
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    
+    results = await make_backup()
+    
+    report_text = "💾 Резервная копия создана:\n\n"
+    for result in results:
+        throughput = result['source_size'] / result['duration'] / 1024 / 1024 if result['duration'] else 0
+        report_text += (
+            f"• {os.path.basename(result['path'])}\n"
+            f"  {result['source_size'] / 1024 / 1024:.1f} МБ → {result['size'] / 1024 / 1024:.1f} МБ "
+            f"за {result['duration']:.2f} с ({throughput:.1f} МБ/с)\n"
+            f"  sha256: {result['sha256'][:16]}…\n"
+        )
+    
+    await message.answer(report_text)
+
+# Команда /restore [ДД.ММ.ГГГГ ЧЧ:ММ] - восстановление на момент времени
+@dp.message(Command("restore"))
+async def cmd_restore(message: types.Message):
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    
+    until = None
+    args = message.text.split(maxsplit=1)[1:]
+    if args:
+        try:
+            until = datetime.strptime(args[0].strip(), "%d.%m.%Y %H:%M")
+        except ValueError:
+            await message.answer("Использование: /restore [ДД.ММ.ГГГГ ЧЧ:ММ]")
+            return
+    
+    try:
+        restored = await restore_backup(until)
+    except ValueError as e:
+        await message.answer(f"❌ {e}")
+        return
+    
+    if not restored:
+        await message.answer("❌ Подходящих резервных копий нет")
+        return
+    
+    await message.answer(
+        "♻️ Восстановлено из:\n" + "\n".join(f"• {os.path.basename(path)}" for path in restored)
+    )
+
+# Рассылка объявления в фоне с отчетом администратору по завершении
+async def broadcast_and_report(admin_id: int, text: str):
+    from broadcast import BROADCAST_CHECKPOINT, format_report, run_broadcast
+    from database.database import async_session
+    
+    try:
+        report = await run_broadcast(bot.send_message, async_session, text, outbound, BROADCAST_CHECKPOINT)
+    except Exception as e:
+        print(f"Ошибка рассылки: {e}")
+        await bot.send_message(admin_id, f"❌ Рассылка прервана: {e}\nПовторите /broadcast с тем же текстом, чтобы продолжить.")
+        return
+    await bot.send_message(admin_id, "📣 Рассылка завершена\n\n" + format_report(report))
+
+# Команда /broadcast <текст> - объявление всем пользователям
+@dp.message(Command("broadcast"))
+async def cmd_broadcast(message: types.Message):
+    global broadcast_task
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    
+    args = message.text.split(maxsplit=1)[1:]
+    if not args:
+        await message.answer("Использование: /broadcast <текст объявления>")
+        return
+    
+    if broadcast_task is not None and not broadcast_task.done():
+        await message.answer("📣 Рассылка уже идет, дождитесь отчета.")
+        return
+    
+    # Рассылка не держит блокировку чата администратора: работает отдельной задачей
+    broadcast_task = asyncio.create_task(broadcast_and_report(message.from_user.id, args[0]))
+    await message.answer(f"📣 Рассылка запущена ({OUTBOUND_RATE:.0f} сообщ./с), отчет придет по завершении.")
+
+# Команда /timezone [Europe/Moscow] - часовой пояс пользователя или группы
+@dp.message(Command("timezone"))
+async def cmd_timezone(message: types.Message):
+    # В групповом чате - часовой пояс общего списка
+    list_id = message.chat.id
+    args = message.text.split(maxsplit=1)[1:]
+    
+    if not args:
+        await message.answer(
+            f"🌍 Ваш часовой пояс: *{user_timezones.get(list_id, DEFAULT_TIMEZONE)}*\n"
+            f"Сейчас: {format_time(user_now(list_id))}\n\n"
+            "Изменить: `/timezone Europe/Berlin`",
+            parse_mode="Markdown"
+        )
+        return
+    
+    zone_name = args[0].strip()
+    try:
+        ZoneInfo(zone_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        await message.answer("❌ Неизвестный часовой пояс. Пример: `Europe/Moscow`", parse_mode="Markdown")
+        return
+    
+    from database.crud import set_user_timezone
+    from database.database import async_session
+    
+    async with async_session() as session:
+        await set_user_timezone(session, list_id, zone_name)
+    user_timezones[list_id] = zone_name
+    users_cache.pop(list_id, None)
+    
+    await message.answer(
+        f"✅ Часовой пояс: *{zone_name}*\nСейчас: {format_time(user_now(list_id))}",
+        parse_mode="Markdown"
+    )
+
+# Быстрое добавление: любое сообщение в личном чате вне диалогов становится
+# задачей; дедлайн и напоминание разбираются из текста, запись - одна.
+# Регистрируется последним, чтобы не перехватывать команды и состояния.
+@dp.message(StateFilter(None), F.chat.type == "private", F.text, ~F.text.startswith("/"))
+async def quick_add(message: types.Message):
+    list_id = message.chat.id
+    
+    lines = [line for line in message.text.splitlines() if line.strip()]
+    if len(lines) > 1:
+        await add_tasks_batch(message, lines)
+        return
+    
+    task_text, deadline, remind_before = parse_quick_add(message.text, get_user_zone(list_id))
+    if not task_text:
+        await message.answer("❌ Текст задачи не может быть пустым!")
+        return
+    
+    reminder_time = None
+    if remind_before is not None:
+        if not deadline:
+            await message.answer(
+                "❌ Для напоминания укажите срок, например:\n"
+                "`сдать отчёт завтра в 18:00 напомни за час`",
+                parse_mode="Markdown"
+            )
+            return
+        reminder_time = deadline - remind_before
+        if reminder_time <= datetime.now(timezone.utc):
+            await message.answer("❌ Время напоминания уже прошло. Укажите интервал короче.")
+            return
+    
+    # Задача и напоминание появляются вместе: между ними нет await,
+    # поэтому запись в хранилище одна (save_data внутри create_reminder)
+    new_task = make_task(list_id, task_text, deadline)
+    tasks_storage.setdefault(list_id, []).append(new_task)
+    task_index = len(tasks_storage[list_id]) - 1
+    record_task_created(list_id, new_task)
+    if reminder_time:
+        create_reminder(list_id, task_index, reminder_time, task_text)
+    else:
+        save_data(list_id)
+    
+    answer_text = f"✅ Задача добавлена: *{task_text}*\n"
+    if deadline:
+        answer_text += f"📅 Дедлайн: *{format_time(deadline)}*\n"
+    if reminder_time:
+        answer_text += f"🔔 Напоминание: *{format_time(reminder_time)}*\n"
+    
+    buttons = []
+    if deadline and not reminder_time:
+        buttons.append(InlineKeyboardButton(text="🔔 Напоминание", callback_data=f"set_reminder_{task_index}"))
+    buttons.append(InlineKeyboardButton(text="📋 Список задач", callback_data="show_all_tasks"))
+    
+    await message.answer(
+        answer_text,
+        parse_mode="Markdown",
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=[buttons])
+    )
+
+async def main():
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    await dp.start_polling(bot)
+
+if __name__ == "__main__":
+    asyncio.run(main())
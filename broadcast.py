@@ -0,0 +1,328 @@
+"""Рассылка объявлений всем пользователям и репетиция пиковой волны напоминаний.
+
+Запуск:
+    python broadcast.py --text "Плановые работы в 23:00"
+    python broadcast.py --text-file announce.txt --rate 20
+    python broadcast.py --dry-run --users 5000 --text "проверка"
+    python broadcast.py --storm 3000 --rate 25
+
+Получатели читаются из таблицы users пачками по первичному ключу, прогресс
+пишется в файл контрольной точки после каждой пачки: повторный запуск с тем же
+текстом продолжает с места остановки. --dry-run и --storm отправляют сообщения
+на локальный фейковый сервер Bot API вместо Telegram.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import Counter, deque
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from aiohttp import web
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from database.crud import get_user_ids_after
+from database.store import read_json, write_json_atomic
+from notifications import RateLimiter, send_limited
+
+# Сколько получателей читать из базы за раз (столько же отправок резервирует очередь)
+BROADCAST_BATCH_SIZE = int(os.getenv('BROADCAST_BATCH_SIZE', '100'))
+# Файл контрольной точки рассылки
+BROADCAST_CHECKPOINT = os.getenv('BROADCAST_CHECKPOINT', 'data/broadcast_checkpoint.json')
+
+
+async def stream_recipients(session_factory, after_id: int, batch_size: int) -> AsyncIterator[List[int]]:
+    """Пачки ID получателей; на каждую пачку - короткая сессия без долгой транзакции"""
+    while True:
+        async with session_factory() as session:
+            batch = await get_user_ids_after(session, after_id, batch_size)
+        if not batch:
+            return
+        yield batch
+        after_id = batch[-1]
+
+
+def load_checkpoint(path: str, text: str) -> Dict:
+    """Рассылка того же текста продолжается, если она не завершена или остались
+    получатели, отложенные из-за ограничения Telegram; иначе начинается заново"""
+    text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    checkpoint = read_json(path)
+    if checkpoint.get('text_sha256') == text_hash and (not checkpoint.get('done') or checkpoint.get('retry_ids')):
+        checkpoint.setdefault('retry_ids', [])
+        return checkpoint
+    return {
+        'text_sha256': text_hash,
+        'last_id': 0,
+        'sent': 0,
+        'failed': 0,
+        'errors': {},
+        # Получатели, которым Telegram так и не дал отправить (429) - повторяются при следующем запуске
+        'retry_ids': [],
+        'duration': 0.0,
+        'done': False
+    }
+
+
+async def run_broadcast(
+    send: Callable[..., Awaitable],
+    session_factory,
+    text: str,
+    limiter: Optional[RateLimiter],
+    checkpoint_path: str = BROADCAST_CHECKPOINT,
+    batch_size: int = BROADCAST_BATCH_SIZE,
+) -> Dict:
+    """Рассылка text всем пользователям; возвращает отчет (он же контрольная точка)"""
+    os.makedirs(os.path.dirname(checkpoint_path) or '.', exist_ok=True)
+    checkpoint = load_checkpoint(checkpoint_path, text)
+    errors = Counter(checkpoint['errors'])
+
+    async def deliver(user_id: int):
+        try:
+            await send_limited(limiter, send, user_id, text)
+            checkpoint['sent'] += 1
+        except TelegramRetryAfter:
+            retry_ids.append(user_id)
+        except Exception as e:
+            # Класс ошибки: TelegramForbiddenError - бот заблокирован, и т.д.
+            checkpoint['failed'] += 1
+            errors[type(e).__name__] += 1
+
+    async def save_checkpoint():
+        checkpoint['errors'] = dict(errors)
+        checkpoint['retry_ids'] = retry_ids
+        await asyncio.to_thread(write_json_atomic, checkpoint_path, json.dumps(checkpoint))
+
+    started = time.perf_counter()
+    # Сначала - отложенные в прошлый раз
+    retry_ids: List[int] = []
+    pending = checkpoint['retry_ids']
+    for start in range(0, len(pending), batch_size):
+        await asyncio.gather(*(deliver(user_id) for user_id in pending[start:start + batch_size]))
+    checkpoint['done'] = False
+    if pending:
+        await save_checkpoint()
+
+    async for batch in stream_recipients(session_factory, checkpoint['last_id'], batch_size):
+        await asyncio.gather(*(deliver(user_id) for user_id in batch))
+
+        # Пачка отправлена целиком (отложенные - в retry_ids) - двигаем контрольную точку
+        checkpoint['last_id'] = batch[-1]
+        checkpoint['duration'] += time.perf_counter() - started
+        started = time.perf_counter()
+        await save_checkpoint()
+
+    checkpoint['duration'] += time.perf_counter() - started
+    checkpoint['done'] = True
+    await save_checkpoint()
+    return checkpoint
+
+
+def format_report(report: Dict) -> str:
+    """Текст отчета о доставке"""
+    duration = report['duration']
+    throughput = report['sent'] / duration if duration else 0
+    report_text = (
+        f"Доставлено: {report['sent']}, ошибок: {report['failed']}\n"
+        f"Время: {duration:.1f} с, {throughput:.1f} сообщ./с\n"
+    )
+    for error, count in sorted(report['errors'].items(), key=lambda item: -item[1]):
+        report_text += f"• {error}: {count}\n"
+    if report.get('retry_ids'):
+        report_text += f"Отложено из-за ограничения Telegram: {len(report['retry_ids'])} - повторите рассылку, чтобы дослать\n"
+    if 'delay_max' in report:
+        report_text += f"Задержка после срока: средняя {report['delay_avg']:.2f} с, макс. {report['delay_max']:.2f} с\n"
+    return report_text
+
+
+class FakeBotAPI:
+    """Локальный сервер Bot API для пробных прогонов.
+
+    Отвечает на sendMessage с задержкой latency, возвращает 429, если за
+    последнюю секунду сообщений больше limit (как Telegram), и 403 для
+    каждого fail_every-го получателя - имитация заблокировавших бота.
+    """
+
+    def __init__(self, latency: float = 0.05, limit: int = 30, fail_every: int = 50):
+        self.latency = latency
+        self.limit = limit
+        self.fail_every = fail_every
+        self.received = 0
+        self._recent: deque = deque()
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Запустить сервер; возвращает базовый URL для TelegramAPIServer"""
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        if method.lower() != 'sendmessage':
+            return web.json_response({'ok': False, 'error_code': 404, 'description': 'Not Found'}, status=404)
+
+        payload = await request.post()
+        chat_id = int(payload['chat_id'])
+
+        now = time.monotonic()
+        while self._recent and self._recent[0] <= now - 1:
+            self._recent.popleft()
+        if len(self._recent) >= self.limit:
+            return web.json_response({
+                'ok': False, 'error_code': 429,
+                'description': 'Too Many Requests: retry after 1',
+                'parameters': {'retry_after': 1}
+            }, status=429)
+        self._recent.append(now)
+
+        await asyncio.sleep(self.latency)
+        if self.fail_every and chat_id % self.fail_every == 0:
+            return web.json_response({
+                'ok': False, 'error_code': 403,
+                'description': 'Forbidden: bot was blocked by the user'
+            }, status=403)
+
+        self.received += 1
+        return web.json_response({'ok': True, 'result': {
+            'message_id': self.received,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'text': payload.get('text', '')
+        }})
+
+
+async def simulate_storm(send: Callable[..., Awaitable], count: int, limiter: Optional[RateLimiter]) -> Dict:
+    """Волна из count напоминаний с одним временем срабатывания через планировщик"""
+    from datetime import datetime, timedelta, timezone
+
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    from apscheduler.triggers.date import DateTrigger
+
+    scheduler = AsyncIOScheduler(timezone=timezone.utc)
+    run_date = datetime.now(timezone.utc) + timedelta(seconds=1)
+    errors = Counter()
+    delays = []
+    done = asyncio.Event()
+    report = {'sent': 0, 'failed': 0}
+
+    async def fire(user_id: int):
+        try:
+            await send_limited(limiter, send, user_id, "🔔 Напоминание (репетиция)")
+            report['sent'] += 1
+        except Exception as e:
+            report['failed'] += 1
+            errors[type(e).__name__] += 1
+        delays.append((datetime.now(timezone.utc) - run_date).total_seconds())
+        if len(delays) == count:
+            done.set()
+
+    for user_id in range(1, count + 1):
+        scheduler.add_job(fire, DateTrigger(run_date=run_date), args=[user_id], misfire_grace_time=None)
+    scheduler.start()
+    await done.wait()
+    scheduler.shutdown(wait=False)
+
+    report['errors'] = dict(errors)
+    report['duration'] = max(delays)
+    report['delay_avg'] = sum(delays) / len(delays)
+    report['delay_max'] = max(delays)
+    return report
+
+
+async def seed_users(count: int, directory: str):
+    """Временная база с count пользователями для пробной рассылки"""
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    from database.database import Base
+    from database.models import User
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(directory, 'dry_run.db')}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as session, session.begin():
+        session.add_all(User(id=user_id) for user_id in range(1, count + 1))
+    return engine, session_factory
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--text', help="текст объявления")
+    parser.add_argument('--text-file', help="файл с текстом объявления")
+    parser.add_argument('--rate', type=float, default=float(os.getenv('OUTBOUND_RATE', '25')),
+                        help="сообщений в секунду; 0 - без ограничения")
+    parser.add_argument('--batch-size', type=int, default=BROADCAST_BATCH_SIZE)
+    parser.add_argument('--checkpoint', default=BROADCAST_CHECKPOINT)
+    parser.add_argument('--dry-run', action='store_true', help="отправлять на локальный фейковый Bot API")
+    parser.add_argument('--users', type=int, help="пробная рассылка по временной базе с N пользователями")
+    parser.add_argument('--storm', type=int, help="репетиция волны из N одновременных напоминаний")
+    parser.add_argument('--latency', type=float, default=0.05, help="задержка фейкового сервера, с")
+    args = parser.parse_args()
+
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    limiter = RateLimiter(args.rate) if args.rate > 0 else None
+    dry_run = args.dry_run or args.storm is not None or args.users is not None
+
+    fake_api = None
+    if dry_run:
+        fake_api = FakeBotAPI(latency=args.latency)
+        server_url = await fake_api.start()
+        bot = Bot(token='123456:dry-run', session=AiohttpSession(api=TelegramAPIServer.from_base(server_url)))
+        print(f"Пробный прогон: фейковый Bot API на {server_url}")
+    else:
+        bot = Bot(token=os.getenv('BOT_TOKEN'))
+
+    try:
+        if args.storm is not None:
+            report = await simulate_storm(bot.send_message, args.storm, limiter)
+            print(f"Волна из {args.storm} напоминаний:")
+            print(format_report(report))
+            return
+
+        text = args.text
+        if args.text_file:
+            with open(args.text_file, 'r', encoding='utf-8') as f:
+                text = f.read()
+        if not text:
+            parser.error("нужен --text или --text-file")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            if args.users is not None:
+                engine, session_factory = await seed_users(args.users, tmp)
+            else:
+                from database.database import async_session, get_engine
+                engine = get_engine()
+                session_factory = async_session
+            # Пробный прогон не должен сдвигать контрольную точку настоящей рассылки
+            checkpoint_path = os.path.join(tmp, 'checkpoint.json') if dry_run else args.checkpoint
+
+            report = await run_broadcast(
+                bot.send_message, session_factory, text, limiter, checkpoint_path, args.batch_size
+            )
+            await engine.dispose()
+        print(format_report(report))
+    finally:
+        await bot.session.close()
+        if fake_api is not None:
+            await fake_api.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
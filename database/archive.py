@@ -0,0 +1,73 @@
+import gzip
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from .store import write_json_atomic
+
+
+class TaskArchive:
+    """Архив выполненных задач в сжатых сегментах.
+
+    У каждого пользователя свой каталог с сегментами по месяцам архивации
+    (<YYYY-MM>.jsonl.gz, дописываются новыми gzip-блоками) и index.json с
+    количеством задач в каждом сегменте, чтобы страница читала только
+    нужные сегменты. Методы блокирующие - вызывайте через asyncio.to_thread.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _user_dir(self, user_id: int) -> str:
+        return os.path.join(self.directory, str(user_id))
+
+    def _read_index(self, user_id: int) -> Dict[str, int]:
+        try:
+            with open(os.path.join(self._user_dir(user_id), 'index.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def append(self, user_id: int, tasks: List[Dict]):
+        """Дописать задачи в сегмент текущего месяца"""
+        if not tasks:
+            return
+
+        user_dir = self._user_dir(user_id)
+        os.makedirs(user_dir, exist_ok=True)
+
+        segment = f"{datetime.now().strftime('%Y-%m')}.jsonl.gz"
+        payload = ''.join(json.dumps(task, ensure_ascii=False) + '\n' for task in tasks)
+        with gzip.open(os.path.join(user_dir, segment), 'at', encoding='utf-8') as f:
+            f.write(payload)
+
+        index = self._read_index(user_id)
+        index[segment] = index.get(segment, 0) + len(tasks)
+        write_json_atomic(os.path.join(user_dir, 'index.json'), json.dumps(index))
+
+    def count(self, user_id: int) -> int:
+        return sum(self._read_index(user_id).values())
+
+    def page(self, user_id: int, page: int, page_size: int) -> Tuple[List[Dict], int]:
+        """Страница архива (сначала новые) и общее число задач"""
+        index = self._read_index(user_id)
+        total = sum(index.values())
+        start = page * page_size
+        end = start + page_size
+
+        result = []
+        offset = 0
+        for segment in sorted(index, reverse=True):
+            count = index[segment]
+            if offset + count > start and offset < end:
+                with gzip.open(os.path.join(self._user_dir(user_id), segment), 'rt', encoding='utf-8') as f:
+                    tasks = [json.loads(line) for line in f if line.strip()]
+                tasks.reverse()
+                result.extend(tasks[max(start - offset, 0):end - offset])
+
+            offset += count
+            if offset >= end:
+                break
+
+        return result, total
@@ -0,0 +1,243 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tarfile
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .store import write_json_atomic
+
+# Сколько страниц SQLite копировать за шаг и пауза между шагами (секунды):
+# между шагами база доступна для записи другим соединениям
+BACKUP_PAGES_PER_STEP = 1024
+BACKUP_STEP_SLEEP = 0.005
+# Уровень gzip: для многогигабайтных баз скорость важнее степени сжатия
+BACKUP_COMPRESS_LEVEL = 3
+# Формат времени в именах снимков
+SNAPSHOT_TIME_FORMAT = "%Y%m%d-%H%M%S"
+DB_SNAPSHOT_PREFIX = "bot-"
+STATE_SNAPSHOT_PREFIX = "state-"
+# Каталог архива выполненных задач внутри снимка состояния
+ARCHIVE_ARCNAME = "archive"
+
+# Все функции модуля блокирующие - вызывайте через asyncio.to_thread
+
+
+def _write_checksum(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+
+    digest = sha256.hexdigest()
+    # Формат совместим с sha256sum -c
+    with open(f"{path}.sha256", 'w', encoding='utf-8') as f:
+        f.write(f"{digest}  {os.path.basename(path)}\n")
+    return digest
+
+
+def verify_checksum(path: str) -> bool:
+    """Проверить снимок по файлу .sha256 рядом с ним"""
+    try:
+        with open(f"{path}.sha256", 'r', encoding='utf-8') as f:
+            expected = f.read().split()[0]
+    except (FileNotFoundError, IndexError):
+        return False
+
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest() == expected
+
+
+def _compress(src_path: str, dest_path: str):
+    tmp_path = f"{dest_path}.tmp"
+    with open(src_path, 'rb') as src, gzip.open(tmp_path, 'wb', compresslevel=BACKUP_COMPRESS_LEVEL) as dest:
+        shutil.copyfileobj(src, dest, 1024 * 1024)
+    os.replace(tmp_path, dest_path)
+
+
+def _online_copy(src_path: str, dest_path: str):
+    """Копирование базы через SQLite backup API небольшими шагами"""
+    src = sqlite3.connect(src_path)
+    dest = sqlite3.connect(dest_path)
+    try:
+        src.backup(dest, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP)
+    finally:
+        dest.close()
+        src.close()
+
+
+def copy_sqlite(db_path: str, backup_dir: str) -> Dict:
+    """Первый шаг онлайн-снимка: копия базы через backup API во временный файл.
+    Только этот шаг требует, чтобы бот не писал в хранилище"""
+    os.makedirs(backup_dir, exist_ok=True)
+    started = time.perf_counter()
+    name = f"{DB_SNAPSHOT_PREFIX}{datetime.now().strftime(SNAPSHOT_TIME_FORMAT)}.db.gz"
+    path = os.path.join(backup_dir, name)
+
+    copy_path = f"{path}.copy"
+    _online_copy(db_path, copy_path)
+    return {'path': path, 'copy_path': copy_path, 'started': started}
+
+
+def finish_sqlite_backup(copy: Dict) -> Dict:
+    """Второй шаг: сжатие копии и контрольная сумма; база при этом не читается"""
+    try:
+        source_size = os.path.getsize(copy['copy_path'])
+        _compress(copy['copy_path'], copy['path'])
+    finally:
+        os.remove(copy['copy_path'])
+
+    checksum = _write_checksum(copy['path'])
+    return {
+        'path': copy['path'],
+        'source_size': source_size,
+        'size': os.path.getsize(copy['path']),
+        'sha256': checksum,
+        'duration': time.perf_counter() - copy['started'],
+    }
+
+
+def backup_sqlite(db_path: str, backup_dir: str) -> Dict:
+    """Онлайн-снимок базы: копия через backup API, сжатие и контрольная сумма"""
+    return finish_sqlite_backup(copy_sqlite(db_path, backup_dir))
+
+
+def _tree_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path) for name in names
+    )
+
+
+def snapshot_state(files: Dict[str, str], archive_dir: str, backup_dir: str) -> Dict:
+    """Снимок состояния бота: JSON-файлы хранилища (имя части -> путь) и каталог
+    архива в одном tar.gz. Вызывайте, пока файлы не меняются (под save_lock бота)"""
+    os.makedirs(backup_dir, exist_ok=True)
+    started = time.perf_counter()
+    name = f"{STATE_SNAPSHOT_PREFIX}{datetime.now().strftime(SNAPSHOT_TIME_FORMAT)}.tar.gz"
+    path = os.path.join(backup_dir, name)
+
+    source_size = 0
+    tmp_path = f"{path}.tmp"
+    with tarfile.open(tmp_path, 'w:gz', compresslevel=BACKUP_COMPRESS_LEVEL) as tar:
+        for part, file_path in files.items():
+            if os.path.exists(file_path):
+                tar.add(file_path, arcname=f"{part}.json")
+                source_size += os.path.getsize(file_path)
+        if os.path.isdir(archive_dir):
+            tar.add(archive_dir, arcname=ARCHIVE_ARCNAME)
+            source_size += _tree_size(archive_dir)
+    os.replace(tmp_path, path)
+
+    checksum = _write_checksum(path)
+    return {
+        'path': path,
+        'source_size': source_size,
+        'size': os.path.getsize(path),
+        'sha256': checksum,
+        'duration': time.perf_counter() - started,
+    }
+
+
+def list_snapshots(backup_dir: str, prefix: str) -> List[str]:
+    """Снимки одного вида, от старых к новым"""
+    try:
+        names = os.listdir(backup_dir)
+    except FileNotFoundError:
+        return []
+    return sorted(
+        os.path.join(backup_dir, name) for name in names
+        if name.startswith(prefix) and name.endswith('.gz')
+    )
+
+
+def snapshot_time(path: str) -> datetime:
+    stamp = os.path.basename(path).split('-', 1)[1].split('.', 1)[0]
+    return datetime.strptime(stamp, SNAPSHOT_TIME_FORMAT)
+
+
+def find_snapshot(backup_dir: str, prefix: str, until: Optional[datetime] = None) -> Optional[str]:
+    """Последний снимок, сделанный не позже until"""
+    for path in reversed(list_snapshots(backup_dir, prefix)):
+        if until is None or snapshot_time(path) <= until:
+            return path
+    return None
+
+
+def prune_snapshots(backup_dir: str, prefix: str, keep: int):
+    """Удалить старые снимки, оставив keep последних"""
+    for path in list_snapshots(backup_dir, prefix)[:-keep]:
+        os.remove(path)
+        if os.path.exists(f"{path}.sha256"):
+            os.remove(f"{path}.sha256")
+
+
+def verify_snapshots(paths: List[str]):
+    """Проверить контрольные суммы всех снимков до начала восстановления"""
+    for path in paths:
+        if not verify_checksum(path):
+            raise ValueError(f"Контрольная сумма не совпадает: {path}")
+
+
+def restore_sqlite(snapshot_path: str, db_path: str) -> float:
+    """Восстановить базу из снимка через backup API, не удаляя файл базы.
+    Снимок должен быть проверен verify_snapshots"""
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(db_path))) as tmp:
+        copy_path = os.path.join(tmp, 'restore.db')
+        with gzip.open(snapshot_path, 'rb') as src, open(copy_path, 'wb') as dest:
+            shutil.copyfileobj(src, dest, 1024 * 1024)
+        _online_copy(copy_path, db_path)
+    return time.perf_counter() - started
+
+
+def _replace_file(src_path: str, dest_path: str):
+    tmp_path = f"{dest_path}.tmp"
+    shutil.copyfile(src_path, tmp_path)
+    os.replace(tmp_path, dest_path)
+
+
+def restore_state(snapshot_path: str, files: Dict[str, str], archive_dir: str):
+    """Вернуть JSON-файлы хранилища и каталог архива из снимка состояния.
+    Снимок должен быть проверен verify_snapshots"""
+    if snapshot_path.endswith('.json.gz'):
+        # Прежний формат: данные бота в одном JSON, без архива
+        with gzip.open(snapshot_path, 'rt', encoding='utf-8') as f:
+            state = json.load(f)
+        for part, file_path in files.items():
+            if part in state:
+                write_json_atomic(file_path, json.dumps(state[part], ensure_ascii=False, indent=2))
+        return
+
+    parent = os.path.dirname(os.path.abspath(archive_dir))
+    os.makedirs(parent, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=parent) as tmp:
+        with tarfile.open(snapshot_path, 'r:gz') as tar:
+            tar.extractall(tmp, filter='data')
+
+        extracted = {part: os.path.join(tmp, f"{part}.json") for part in files}
+        has_files = any(os.path.exists(path) for path in extracted.values())
+        for part, file_path in files.items():
+            if os.path.exists(extracted[part]):
+                _replace_file(extracted[part], file_path)
+            elif has_files and os.path.exists(file_path):
+                # Файла еще не было на момент снимка
+                os.remove(file_path)
+
+        # Архив заменяется целиком: задачи, архивированные после снимка, в нем еще активны
+        old_archive = f"{archive_dir}.old"
+        shutil.rmtree(old_archive, ignore_errors=True)
+        if os.path.isdir(archive_dir):
+            os.replace(archive_dir, old_archive)
+        restored_archive = os.path.join(tmp, ARCHIVE_ARCNAME)
+        if os.path.isdir(restored_archive):
+            os.replace(restored_archive, archive_dir)
+        shutil.rmtree(old_archive, ignore_errors=True)
@@ -1,5 +1,6 @@
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, update, delete, func, case, or_
 from sqlalchemy.ext.asyncio import AsyncSession
+import time
 from datetime import datetime
 from .models import User, Task, Reminder
 from .database import async_session
@@ -17,12 +18,20 @@ async def get_or_create_user(session: AsyncSession, user_id: int, username: str
     
     return user
 
+async def get_recently_active_users(session: AsyncSession, since: datetime) -> list[User]:
+    """Получить пользователей, зарегистрированных или создававших задачи после since"""
+    recent_task_users = select(Task.user_id).where(Task.created_at >= since)
+    query = select(User).where(or_(User.created_at >= since, User.id.in_(recent_task_users)))
+    
+    result = await session.execute(query)
+    return result.scalars().all()
+
 async def create_task(session: AsyncSession, user_id: int, text: str, deadline: datetime = None) -> Task:
-    """Создать новую задачу"""
+    """Создать новую задачу; deadline хранится как UTC epoch"""
     task = Task(
         user_id=user_id,
         text=text,
-        deadline=deadline,
+        deadline=int(deadline.timestamp()) if deadline else None,
         created_at=datetime.now()
     )
     session.add(task)
@@ -41,3 +50,46 @@ async def get_user_tasks(session: AsyncSession, user_id: int, completed: bool =
     
     result = await session.execute(query)
     return result.scalars().all()
+
+async def get_global_stats(session: AsyncSession) -> dict:
+    """Сводная статистика по всем пользователям за один проход по задачам"""
+    now = int(time.time())
+    query = select(
+        select(func.count(User.id)).scalar_subquery(),
+        func.count(Task.id),
+        func.coalesce(func.sum(case((Task.completed == True, 1), else_=0)), 0),
+        func.coalesce(func.sum(case(((Task.completed == False) & (Task.deadline < now), 1), else_=0)), 0),
+        func.avg(case((
+            Task.completed == True,
+            (func.julianday(Task.completed_at) - func.julianday(Task.created_at)) * 24 * 60
+        ))),
+    )
+    
+    users, tasks, completed, overdue, avg_latency = (await session.execute(query)).one()
+    return {
+        'users': users,
+        'tasks': tasks,
+        'completed': completed,
+        'overdue': overdue,
+        'avg_latency_minutes': avg_latency,
+    }
+
+async def get_user_timezones(session: AsyncSession) -> dict[int, str]:
+    """Часовые пояса пользователей, у которых он задан"""
+    result = await session.execute(select(User.id, User.timezone).where(User.timezone.is_not(None)))
+    return dict(result.all())
+
+async def set_user_timezone(session: AsyncSession, user_id: int, timezone: str):
+    """Установить часовой пояс пользователя"""
+    user = await get_or_create_user(session, user_id)
+    user.timezone = timezone
+    await session.commit()
+
+async def get_user_ids_after(session: AsyncSession, after_id: int, limit: int) -> list[int]:
+    """Следующая пачка ID пользователей после after_id (keyset-пагинация по первичному ключу).
+
+    Групповые чаты (отрицательные ID) не выбираются.
+    """
+    query = select(User.id).where(User.id > max(after_id, 0)).order_by(User.id).limit(limit)
+    result = await session.execute(query)
+    return result.scalars().all()
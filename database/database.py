@@ -1,24 +1,95 @@
-from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker, create_async_engine, AsyncSession
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncAttrs, AsyncEngine, create_async_engine, AsyncSession
+from sqlalchemy import inspect, text
 from sqlalchemy.orm import DeclarativeBase
 
-# Создаем асинхронный движок для SQLite[citation:2]
-engine = create_async_engine(
-    url='sqlite+aiosqlite:///data/bot.db',  # Файл базы данных
-    echo=False  # Установите True для отладки SQL-запросов
-)
+# Файл базы данных
+DB_PATH = 'data/bot.db'
+
+# Движок создается при первом обращении к базе
+_engine: Optional[AsyncEngine] = None
+
+def get_engine() -> AsyncEngine:
+    """Асинхронный движок для SQLite, создается при первом вызове"""
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine(
+            url=f'sqlite+aiosqlite:///{DB_PATH}',
+            echo=False  # Установите True для отладки SQL-запросов
+        )
+    return _engine
 
-# Фабрика сессий для работы с БД
-async_session = async_sessionmaker(
-    engine, 
-    class_=AsyncSession,
-    expire_on_commit=False
-)
+def async_session() -> AsyncSession:
+    """Новая сессия для работы с БД"""
+    return AsyncSession(get_engine(), expire_on_commit=False)
+
+async def dispose_engine():
+    """Закрыть соединения пула, если движок уже создан"""
+    if _engine is not None:
+        await _engine.dispose()
 
 class Base(AsyncAttrs, DeclarativeBase):
     """Базовый класс для всех моделей"""
     pass
 
+def add_missing_columns(conn):
+    """Добавление новых столбцов моделей в уже существующие таблицы"""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+def relax_not_null_columns(conn):
+    """Снятие NOT NULL со столбцов, которые в моделях стали необязательными.
+
+    SQLite не умеет менять ограничения столбца: таблица пересоздается по
+    модели, данные общих столбцов копируются.
+    """
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column['name']: column for column in inspector.get_columns(table.name)}
+        stale = [
+            column for column in table.columns
+            if column.name in existing and column.nullable and not existing[column.name]['nullable']
+        ]
+        if not stale:
+            continue
+
+        old_name = f'{table.name}_old'
+        for index in inspector.get_indexes(table.name):
+            conn.execute(text(f'DROP INDEX {index["name"]}'))
+        # Ссылки других таблиц остаются на имени table.name, а не переезжают на _old
+        conn.execute(text('PRAGMA legacy_alter_table = ON'))
+        conn.execute(text(f'ALTER TABLE {table.name} RENAME TO {old_name}'))
+        conn.execute(text('PRAGMA legacy_alter_table = OFF'))
+        table.create(conn)
+        columns = ', '.join(column.name for column in table.columns if column.name in existing)
+        conn.execute(text(f'INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {old_name}'))
+        conn.execute(text(f'DROP TABLE {old_name}'))
+
+def create_missing_indexes(conn):
+    """Индексы и уникальные ключи моделей, которых нет в уже существующих таблицах"""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+        unique = {tuple(constraint['column_names']) for constraint in inspector.get_unique_constraints(table.name)}
+        unique |= {tuple(index['column_names']) for index in inspector.get_indexes(table.name) if index['unique']}
+        for column in table.columns:
+            if column.unique and (column.name,) not in unique:
+                conn.execute(text(
+                    f'CREATE UNIQUE INDEX uq_{table.name}_{column.name} ON {table.name} ({column.name})'
+                ))
+
 async def create_tables():
-    """Создание таблиц в базе данных"""
-    async with engine.begin() as conn:
+    """Создание таблиц в базе данных и обновление схемы уже существующих"""
+    async with get_engine().begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+        await conn.run_sync(relax_not_null_columns)
+        await conn.run_sync(create_missing_indexes)
@@ -1,4 +1,4 @@
-from sqlalchemy import BigInteger, Integer, Text, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import BigInteger, Integer, Text, String, DateTime, Boolean, ForeignKey, JSON, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import datetime
 from .database import Base
@@ -10,6 +10,8 @@ class User(Base):
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     username: Mapped[str] = mapped_column(String, nullable=True)
     full_name: Mapped[str] = mapped_column(String, nullable=True)
+    # Часовой пояс IANA, например Europe/Moscow
+    timezone: Mapped[str] = mapped_column(String, nullable=True)
     created_at: Mapped[datetime] = mapped_column(default=datetime.now)
     
     # Связь с задачами (один пользователь - много задач)
@@ -21,27 +23,62 @@ class Task(Base):
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
+    # Позиция задачи в списке пользователя
+    position: Mapped[int] = mapped_column(Integer, default=0)
     text: Mapped[str] = mapped_column(Text, nullable=False)
     completed: Mapped[bool] = mapped_column(Boolean, default=False)
     created_at: Mapped[datetime] = mapped_column(default=datetime.now)
     completed_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
     
-    # Дедлайн задачи
-    deadline: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    # Дедлайн задачи (UTC epoch, секунды)
+    deadline: Mapped[int] = mapped_column(BigInteger, nullable=True)
     
     # Связи
     user: Mapped["User"] = relationship("User", back_populates="tasks")
     reminders: Mapped[list["Reminder"]] = relationship("Reminder", back_populates="task", cascade="all, delete-orphan")
+    
+    __table_args__ = (Index('ix_tasks_user_position', 'user_id', 'position'),)
 
 class Reminder(Base):
     """Модель напоминания"""
     __tablename__ = 'reminders'
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    task_id: Mapped[int] = mapped_column(ForeignKey('tasks.id'), nullable=False)
-    reminder_time: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    # Идентификатор напоминания в планировщике
+    key: Mapped[str] = mapped_column(String, unique=True, nullable=True)
+    user_id: Mapped[int] = mapped_column(BigInteger, index=True, nullable=True)
+    task_index: Mapped[int] = mapped_column(Integer, nullable=True)
+    task_text: Mapped[str] = mapped_column(Text, nullable=True)
+    task_id: Mapped[int] = mapped_column(ForeignKey('tasks.id'), nullable=True)
+    # Время напоминания (UTC epoch, секунды)
+    reminder_time: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
     sent: Mapped[bool] = mapped_column(Boolean, default=False)
     created_at: Mapped[datetime] = mapped_column(default=datetime.now)
     
     # Связь с задачей
     task: Mapped["Task"] = relationship("Task", back_populates="reminders")
+
+class UserStats(Base):
+    """Агрегированная статистика пользователя"""
+    __tablename__ = 'user_stats'
+    
+    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    data: Mapped[dict] = mapped_column(JSON, nullable=False)
+
+class SharedList(Base):
+    """Общий список задач группового чата"""
+    __tablename__ = 'shared_lists'
+    
+    # ID чата, которому принадлежит список
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    title: Mapped[str] = mapped_column(String, nullable=True)
+    
+    members: Mapped[list["ListMember"]] = relationship("ListMember", cascade="all, delete-orphan")
+
+class ListMember(Base):
+    """Участник общего списка, получает сводки изменений"""
+    __tablename__ = 'list_members'
+    
+    list_id: Mapped[int] = mapped_column(ForeignKey('shared_lists.id'), primary_key=True)
+    # Индекс для выборки списков пользователя
+    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, index=True)
@@ -0,0 +1,184 @@
+import copy
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, select, update
+
+from .models import ListMember, Reminder, SharedList, Task, User, UserStats
+from .store import TASK_TIME_FORMAT
+
+
+def task_to_dict(task: Task) -> Dict:
+    return {
+        'text': task.text,
+        'completed': task.completed,
+        'created_at': task.created_at.strftime(TASK_TIME_FORMAT),
+        'completed_at': task.completed_at.strftime(TASK_TIME_FORMAT) if task.completed_at else None,
+        'deadline': task.deadline,
+        'reminders': []
+    }
+
+
+def update_task_row(row: Task, task: Dict):
+    row.text = task['text']
+    row.completed = task['completed']
+    row.created_at = datetime.strptime(task['created_at'], TASK_TIME_FORMAT)
+    row.completed_at = datetime.strptime(task['completed_at'], TASK_TIME_FORMAT) if task.get('completed_at') else None
+    row.deadline = task.get('deadline')
+
+
+class SqlStore:
+    """Хранилище в базе данных через SQLAlchemy (модели из database.models).
+
+    Задача пользователя - строка tasks с позицией в списке; при сохранении
+    строки обновляются на месте, лишние удаляются.
+    """
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    async def load_tasks(self) -> Dict[int, List[Dict]]:
+        async with self.session_factory() as session:
+            tasks = {user_id: [] for user_id in (await session.execute(select(User.id))).scalars()}
+            rows = await session.execute(select(Task).order_by(Task.user_id, Task.position))
+            for row in rows.scalars():
+                tasks.setdefault(row.user_id, []).append(task_to_dict(row))
+        return tasks
+
+    async def save_tasks(self, tasks: Dict[int, List[Dict]], user_ids: Optional[Iterable[int]] = None) -> None:
+        async with self.session_factory() as session, session.begin():
+            if user_ids is None:
+                user_ids = list(tasks)
+                await session.execute(delete(Reminder).where(Reminder.user_id.notin_(user_ids)))
+                await session.execute(delete(Task).where(Task.user_id.notin_(user_ids)))
+
+            for user_id in user_ids:
+                user_tasks = tasks.get(user_id, [])
+                if await session.get(User, user_id) is None:
+                    session.add(User(id=user_id))
+
+                rows = (await session.execute(
+                    select(Task).where(Task.user_id == user_id).order_by(Task.position)
+                )).scalars().all()
+
+                for position, task in enumerate(user_tasks):
+                    if position < len(rows):
+                        row = rows[position]
+                    else:
+                        row = Task(user_id=user_id, position=position)
+                        session.add(row)
+                    update_task_row(row, task)
+
+                for row in rows[len(user_tasks):]:
+                    await session.delete(row)
+
+    async def load_stats(self) -> Dict[int, Dict]:
+        async with self.session_factory() as session:
+            rows = await session.execute(select(UserStats))
+            return {row.user_id: row.data for row in rows.scalars()}
+
+    async def save_stats(self, stats: Dict[int, Dict], user_ids: Optional[Iterable[int]] = None) -> None:
+        if user_ids is None:
+            user_ids = list(stats)
+
+        async with self.session_factory() as session, session.begin():
+            for user_id in user_ids:
+                if user_id in stats:
+                    await session.merge(UserStats(user_id=user_id, data=copy.deepcopy(stats[user_id])))
+
+    async def load_lists(self) -> Dict[int, Dict]:
+        async with self.session_factory() as session:
+            lists = {
+                row.id: {'title': row.title, 'members': []}
+                for row in (await session.execute(select(SharedList))).scalars()
+            }
+            rows = await session.execute(
+                select(ListMember.list_id, ListMember.user_id).order_by(ListMember.list_id, ListMember.user_id)
+            )
+            for list_id, user_id in rows:
+                lists[list_id]['members'].append(user_id)
+        return lists
+
+    async def save_lists(self, lists: Dict[int, Dict]) -> None:
+        async with self.session_factory() as session, session.begin():
+            await session.execute(delete(ListMember).where(ListMember.list_id.notin_(list(lists))))
+            await session.execute(delete(SharedList).where(SharedList.id.notin_(list(lists))))
+
+            existing = set((await session.execute(select(ListMember.list_id, ListMember.user_id))).all())
+            wanted = {
+                (list_id, user_id)
+                for list_id, shared_list in lists.items()
+                for user_id in shared_list['members']
+            }
+
+            for list_id, shared_list in lists.items():
+                await session.merge(SharedList(id=list_id, title=shared_list['title']))
+            # Пишутся только изменения состава, а не весь список участников
+            for list_id, user_id in existing - wanted:
+                await session.execute(delete(ListMember).where(
+                    ListMember.list_id == list_id, ListMember.user_id == user_id
+                ))
+            session.add_all(ListMember(list_id=list_id, user_id=user_id) for list_id, user_id in wanted - existing)
+
+    async def load_reminders(self) -> Dict[str, Dict]:
+        async with self.session_factory() as session:
+            rows = await session.execute(select(Reminder).where(Reminder.key.is_not(None)))
+            return {
+                row.key: {
+                    'user_id': row.user_id,
+                    'task_index': row.task_index,
+                    'reminder_time': row.reminder_time,
+                    'task_text': row.task_text
+                }
+                for row in rows.scalars()
+            }
+
+    async def save_reminders(self, reminders: Dict[str, Dict]) -> None:
+        async with self.session_factory() as session, session.begin():
+            existing = {
+                key: {'user_id': user_id, 'task_index': task_index, 'reminder_time': reminder_time, 'task_text': task_text}
+                for key, user_id, task_index, reminder_time, task_text in await session.execute(
+                    select(Reminder.key, Reminder.user_id, Reminder.task_index, Reminder.reminder_time, Reminder.task_text)
+                    .where(Reminder.key.is_not(None))
+                )
+            }
+
+            removed = existing.keys() - reminders.keys()
+            if removed:
+                await session.execute(delete(Reminder).where(Reminder.key.in_(removed)))
+
+            added = [key for key in reminders if key not in existing]
+            # Измененные напоминания: remove_tasks() переносит task_index при удалении задач
+            changed = [key for key in reminders if key in existing and reminders[key] != existing[key]]
+            if not added and not changed:
+                return
+
+            # Привязка к строкам задач по позиции в списке пользователя
+            user_ids = {reminders[key]['user_id'] for key in added + changed}
+            task_ids = {
+                (user_id, position): task_id
+                for task_id, user_id, position in await session.execute(
+                    select(Task.id, Task.user_id, Task.position).where(Task.user_id.in_(user_ids))
+                )
+            }
+
+            for key in changed:
+                reminder = reminders[key]
+                await session.execute(update(Reminder).where(Reminder.key == key).values(
+                    user_id=reminder['user_id'],
+                    task_index=reminder['task_index'],
+                    task_id=task_ids.get((reminder['user_id'], reminder['task_index'])),
+                    task_text=reminder['task_text'],
+                    reminder_time=reminder['reminder_time']
+                ))
+
+            for key in added:
+                reminder = reminders[key]
+                session.add(Reminder(
+                    key=key,
+                    user_id=reminder['user_id'],
+                    task_index=reminder['task_index'],
+                    task_id=task_ids.get((reminder['user_id'], reminder['task_index'])),
+                    task_text=reminder['task_text'],
+                    reminder_time=reminder['reminder_time']
+                ))
@@ -0,0 +1,159 @@
+import asyncio
+import copy
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Protocol
+
+# Формат дат создания и выполнения задач в словарях бота
+TASK_TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+
+class TaskStore(Protocol):
+    """Хранилище задач и статистики пользователей"""
+
+    async def load_tasks(self) -> Dict[int, List[Dict]]: ...
+
+    async def save_tasks(self, tasks: Dict[int, List[Dict]], user_ids: Optional[Iterable[int]] = None) -> None:
+        """Сохранить задачи; user_ids ограничивает запись измененными пользователями"""
+        ...
+
+    async def load_stats(self) -> Dict[int, Dict]: ...
+
+    async def save_stats(self, stats: Dict[int, Dict], user_ids: Optional[Iterable[int]] = None) -> None: ...
+
+    async def load_lists(self) -> Dict[int, Dict]:
+        """Общие списки: ID чата -> {'title': ..., 'members': [ID пользователей]}"""
+        ...
+
+    async def save_lists(self, lists: Dict[int, Dict]) -> None: ...
+
+
+class ReminderStore(Protocol):
+    """Хранилище напоминаний"""
+
+    async def load_reminders(self) -> Dict[str, Dict]: ...
+
+    async def save_reminders(self, reminders: Dict[str, Dict]) -> None: ...
+
+
+class MemoryStore:
+    """Хранилище в памяти процесса - для тестов и бенчмарков"""
+
+    def __init__(self):
+        self.tasks: Dict[int, List[Dict]] = {}
+        self.stats: Dict[int, Dict] = {}
+        self.reminders: Dict[str, Dict] = {}
+        self.lists: Dict[int, Dict] = {}
+
+    async def load_tasks(self) -> Dict[int, List[Dict]]:
+        return copy.deepcopy(self.tasks)
+
+    async def save_tasks(self, tasks: Dict[int, List[Dict]], user_ids: Optional[Iterable[int]] = None) -> None:
+        if user_ids is None:
+            self.tasks = copy.deepcopy(tasks)
+            return
+        for user_id in user_ids:
+            if user_id in tasks:
+                self.tasks[user_id] = copy.deepcopy(tasks[user_id])
+            else:
+                self.tasks.pop(user_id, None)
+
+    async def load_stats(self) -> Dict[int, Dict]:
+        return copy.deepcopy(self.stats)
+
+    async def save_stats(self, stats: Dict[int, Dict], user_ids: Optional[Iterable[int]] = None) -> None:
+        if user_ids is None:
+            self.stats = copy.deepcopy(stats)
+            return
+        for user_id in user_ids:
+            if user_id in stats:
+                self.stats[user_id] = copy.deepcopy(stats[user_id])
+
+    async def load_lists(self) -> Dict[int, Dict]:
+        return copy.deepcopy(self.lists)
+
+    async def save_lists(self, lists: Dict[int, Dict]) -> None:
+        self.lists = copy.deepcopy(lists)
+
+    async def load_reminders(self) -> Dict[str, Dict]:
+        return copy.deepcopy(self.reminders)
+
+    async def save_reminders(self, reminders: Dict[str, Dict]) -> None:
+        self.reminders = copy.deepcopy(reminders)
+
+
+def write_json_atomic(path: str, payload: str):
+    """Атомарная запись: при сбое во время записи старый файл остается целым"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_json(path: str) -> Dict:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+class JsonStore:
+    """Хранилище в JSON-файлах; каждый файл перезаписывается целиком.
+
+    Сериализация выполняется в потоке event loop (данные не меняются во время
+    записи), запись на диск - в отдельном потоке.
+    """
+
+    def __init__(self, data_file: str, reminders_file: str, stats_file: str, lists_file: str):
+        self.data_file = data_file
+        self.reminders_file = reminders_file
+        self.stats_file = stats_file
+        self.lists_file = lists_file
+
+    async def _write(self, path: str, data):
+        payload = json.dumps(data, ensure_ascii=False, indent=2)
+        await asyncio.to_thread(write_json_atomic, path, payload)
+
+    async def load_tasks(self) -> Dict[int, List[Dict]]:
+        data = await asyncio.to_thread(read_json, self.data_file)
+        return {int(k): v for k, v in data.items()}
+
+    async def save_tasks(self, tasks: Dict[int, List[Dict]], user_ids: Optional[Iterable[int]] = None) -> None:
+        await self._write(self.data_file, tasks)
+
+    async def load_stats(self) -> Dict[int, Dict]:
+        data = await asyncio.to_thread(read_json, self.stats_file)
+        return {int(k): v for k, v in data.items()}
+
+    async def save_stats(self, stats: Dict[int, Dict], user_ids: Optional[Iterable[int]] = None) -> None:
+        await self._write(self.stats_file, stats)
+
+    async def load_lists(self) -> Dict[int, Dict]:
+        data = await asyncio.to_thread(read_json, self.lists_file)
+        return {int(k): v for k, v in data.items()}
+
+    async def save_lists(self, lists: Dict[int, Dict]) -> None:
+        await self._write(self.lists_file, lists)
+
+    async def load_reminders(self) -> Dict[str, Dict]:
+        return await asyncio.to_thread(read_json, self.reminders_file)
+
+    async def save_reminders(self, reminders: Dict[str, Dict]) -> None:
+        await self._write(self.reminders_file, reminders)
+
+
+def create_store(backend: str, data_file: str, reminders_file: str, stats_file: str, lists_file: str):
+    """Создать хранилище по имени: memory, json или sql"""
+    if backend == 'memory':
+        return MemoryStore()
+    if backend == 'json':
+        return JsonStore(data_file, reminders_file, stats_file, lists_file)
+    if backend == 'sql':
+        # SQLAlchemy импортируется только для этого хранилища
+        from .database import async_session
+        from .sql_store import SqlStore
+        return SqlStore(async_session)
+    raise ValueError(f"Неизвестное хранилище: {backend}")
@@ -0,0 +1,171 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+
+class InflightMiddleware(BaseMiddleware):
+    """Учет обрабатываемых апдейтов для корректной остановки бота"""
+
+    def __init__(self):
+        self.accepting = True
+        self.inflight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        # После начала остановки новые апдейты не обрабатываем
+        if not self.accepting:
+            return None
+
+        self.inflight += 1
+        self._idle.clear()
+        try:
+            return await handler(event, data)
+        finally:
+            self.inflight -= 1
+            if self.inflight == 0:
+                self._idle.set()
+
+    async def drain(self, timeout: float) -> bool:
+        """Прекратить прием апдейтов и дождаться завершения текущих"""
+        self.accepting = False
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class StartupGateMiddleware(BaseMiddleware):
+    """Апдейты, пришедшие до окончания фоновой инициализации, ждут ее.
+
+    Позволяет начать опрос Telegram, пока база данных еще открывается.
+    """
+
+    def __init__(self):
+        self.ready = asyncio.Event()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not self.ready.is_set():
+            await self.ready.wait()
+        return await handler(event, data)
+
+
+class UserLockMiddleware(BaseMiddleware):
+    """Последовательная обработка апдейтов одного чата.
+
+    Ключ блокировки - чат: в групповом чате все участники меняют один общий
+    список. Апдейты разных чатов обрабатываются параллельно, общее число
+    одновременно работающих обработчиков ограничено max_concurrent.
+    Фоновые задачи, меняющие список чата, берут ту же блокировку через hold().
+    """
+
+    def __init__(self, max_concurrent: int):
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._users: Dict[int, int] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.metrics = {'acquired': 0, 'contended': 0, 'wait_total': 0.0, 'wait_max': 0.0}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        chat = data.get('event_chat')
+        user = data.get('event_from_user')
+        if chat is None and user is None:
+            async with self._semaphore:
+                return await handler(event, data)
+
+        key = chat.id if chat is not None else user.id
+        async with self.hold(key):
+            async with self._semaphore:
+                return await handler(event, data)
+
+    @asynccontextmanager
+    async def hold(self, key: int) -> AsyncIterator[None]:
+        """Блокировка чата key на время блока"""
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._users[key] = self._users.get(key, 0) + 1
+
+        contended = lock.locked()
+        started = time.perf_counter()
+        try:
+            async with lock:
+                self._record_wait(contended, time.perf_counter() - started)
+                yield
+        finally:
+            # Блокировку удаляем, когда у чата не осталось апдейтов
+            self._users[key] -= 1
+            if not self._users[key]:
+                del self._users[key]
+                del self._locks[key]
+
+    def _record_wait(self, contended: bool, waited: float):
+        self.metrics['acquired'] += 1
+        if contended:
+            self.metrics['contended'] += 1
+            self.metrics['wait_total'] += waited
+            self.metrics['wait_max'] = max(self.metrics['wait_max'], waited)
+
+
+class CallbackDebounceMiddleware(BaseMiddleware):
+    """Схлопывание повторных нажатий инлайн-кнопок.
+
+    Регистрируется на уровне апдейтов до UserLockMiddleware, чтобы дубликаты
+    не ждали блокировку пользователя. Повторный callback с теми же
+    (пользователь, сообщение, данные) в течение ttl только подтверждается.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.suppressed = 0
+        self._seen: Dict[Tuple[int, int, str], float] = {}
+        self._expiry: Deque[Tuple[float, Tuple[int, int, str]]] = deque()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        query = event.callback_query if isinstance(event, Update) else None
+        if query is None or query.message is None:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        self._evict(now)
+
+        key = (query.from_user.id, query.message.message_id, query.data)
+        if key in self._seen:
+            self.suppressed += 1
+            await query.answer()
+            return None
+
+        expires_at = now + self.ttl
+        self._seen[key] = expires_at
+        self._expiry.append((expires_at, key))
+        return await handler(event, data)
+
+    def _evict(self, now: float):
+        while self._expiry and self._expiry[0][0] <= now:
+            _, key = self._expiry.popleft()
+            del self._seen[key]
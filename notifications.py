@@ -0,0 +1,150 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+
+# Сколько изменений перечислять в одной сводке
+DIGEST_MAX_LINES = 20
+# Сколько раз повторять отправку после 429, прежде чем вернуть ошибку
+SEND_RETRY_LIMIT = 5
+
+
+class RateLimiter:
+    """Равномерный темп исходящих сообщений: не больше rate в секунду.
+
+    Каждый вызов wait() резервирует следующий свободный слот, поэтому
+    одновременные отправители выстраиваются в очередь, а не идут пачкой.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate
+        self._next_slot = 0.0
+
+    async def wait(self):
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def pause(self, seconds: float):
+        """Сдвинуть очередь: Telegram попросил подождать"""
+        self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
+
+async def send_limited(
+    limiter: Optional[RateLimiter],
+    send: Callable[..., Awaitable],
+    chat_id: int,
+    text: str,
+    **kwargs: Any,
+):
+    """Отправка в темпе limiter; при 429 очередь сдвигается на retry_after и отправка
+    повторяется, пока не пройдет (не больше SEND_RETRY_LIMIT раз)"""
+    if limiter is not None:
+        await limiter.wait()
+    for attempt in range(SEND_RETRY_LIMIT + 1):
+        try:
+            return await send(chat_id, text, **kwargs)
+        except TelegramRetryAfter as e:
+            if attempt == SEND_RETRY_LIMIT:
+                raise
+            if limiter is not None:
+                limiter.pause(e.retry_after)
+                await limiter.wait()
+            else:
+                await asyncio.sleep(e.retry_after)
+
+
+class FanoutNotifier:
+    """Рассылка изменений общих списков их участникам.
+
+    Каждое изменение публикуется одним событием. События списка копятся
+    window секунд и уходят каждому участнику одной сводкой; темп отправки
+    задает общий для бота limiter. Участник не получает свои собственные
+    изменения.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[int, str], Awaitable],
+        members: Callable[[int], Set[int]],
+        title: Callable[[int], str],
+        window: float,
+        limiter: RateLimiter,
+    ):
+        self._send = send
+        self._members = members
+        self._title = title
+        self.window = window
+        self._limiter = limiter
+        self._pending: Dict[int, List[Tuple[int, str]]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self.metrics = {'events': 0, 'digests': 0, 'sent': 0, 'failed': 0}
+
+    def publish(self, list_id: int, actor_id: int, text: str):
+        """Зарегистрировать изменение списка; рассылка - после окна накопления"""
+        self.metrics['events'] += 1
+        self._pending.setdefault(list_id, []).append((actor_id, text))
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        try:
+            await asyncio.wait_for(self._wake.wait(), self.window)
+        except asyncio.TimeoutError:
+            pass
+        await self.flush()
+
+    async def flush(self):
+        """Разослать все накопленные сводки"""
+        while self._pending:
+            pending, self._pending = self._pending, {}
+            for list_id, events in pending.items():
+                await self._deliver(list_id, events)
+
+    async def _deliver(self, list_id: int, events: List[Tuple[int, str]]):
+        actors = {actor_id for actor_id, _ in events}
+        common_digest = self._format(list_id, [text for _, text in events])
+
+        for user_id in sorted(self._members(list_id)):
+            if user_id in actors:
+                # Автору изменений - сводка без его собственных событий
+                texts = [text for actor_id, text in events if actor_id != user_id]
+                if not texts:
+                    continue
+                digest = self._format(list_id, texts)
+            else:
+                digest = common_digest
+
+            self.metrics['digests'] += 1
+            await self._send_throttled(user_id, digest)
+
+    def _format(self, list_id: int, texts: List[str]) -> str:
+        digest = f"👥 {self._title(list_id)}: изменения\n\n"
+        digest += "\n".join(f"• {text}" for text in texts[:DIGEST_MAX_LINES])
+        if len(texts) > DIGEST_MAX_LINES:
+            digest += f"\n... и еще {len(texts) - DIGEST_MAX_LINES}"
+        return digest
+
+    async def _send_throttled(self, chat_id: int, text: str):
+        try:
+            await send_limited(self._limiter, self._send, chat_id, text)
+        except TelegramAPIError:
+            # Пользователь не начинал диалог с ботом или заблокировал его
+            self.metrics['failed'] += 1
+            return
+        self.metrics['sent'] += 1
+
+    async def drain(self, timeout: float) -> bool:
+        """Разослать накопленное без ожидания окна (при остановке)"""
+        self._wake.set()
+        if self._task is None:
+            return True
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
@@ -0,0 +1,173 @@
+import asyncio
+import functools
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Optional
+
+# Каталог для результатов профилирования
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+# Интервал сэмплирования стека в секундах
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.005'))
+# Сколько строк выводить в отчете по аллокациям
+ALLOCATIONS_TOP = 30
+
+
+class Profiler:
+    """Сэмплирующий профилировщик с именованными участками (spans)"""
+
+    def __init__(self):
+        self.enabled = False
+        self.spans: Dict[str, Dict] = {}
+        self.samples: Counter = Counter()
+        self._thread: Optional[threading.Thread] = None
+        self._target_ident: Optional[int] = None
+        self._stop = threading.Event()
+        # samples пополняет поток сэмплирования, а читает dump
+        self._samples_lock = threading.Lock()
+
+    def start(self):
+        """Включить профилирование для потока, в котором работает event loop"""
+        if self.enabled:
+            return
+
+        self.spans.clear()
+        self.samples.clear()
+        tracemalloc.start()
+
+        self._target_ident = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        self._thread.start()
+        self.enabled = True
+
+    def stop(self):
+        """Выключить профилирование"""
+        if not self.enabled:
+            return
+
+        self.enabled = False
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        tracemalloc.stop()
+
+    def _sample_loop(self):
+        while not self._stop.wait(PROFILE_INTERVAL):
+            frame = sys._current_frames().get(self._target_ident)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            with self._samples_lock:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def record(self, name: str, elapsed: float, allocated: int):
+        """Учесть одно выполнение участка"""
+        span = self.spans.get(name)
+        if span is None:
+            span = self.spans[name] = {'count': 0, 'total': 0.0, 'max': 0.0, 'allocated': 0}
+
+        span['count'] += 1
+        span['total'] += elapsed
+        span['max'] = max(span['max'], elapsed)
+        span['allocated'] += allocated
+
+    def dump(self) -> str:
+        """Записать тайминги, аллокации и collapsed stacks на диск, вернуть каталог"""
+        spans, samples = self._copy()
+        return self._write(spans, samples)
+
+    async def dump_async(self) -> str:
+        """dump() из event loop: снимок tracemalloc и запись файлов идут в отдельном
+        потоке, счетчики копируются в потоке event loop, где их меняют участки"""
+        spans, samples = self._copy()
+        return await asyncio.to_thread(self._write, spans, samples)
+
+    def _copy(self):
+        spans = {name: dict(span) for name, span in self.spans.items()}
+        with self._samples_lock:
+            samples = Counter(self.samples)
+        return spans, samples
+
+    def _write(self, spans: Dict[str, Dict], samples: Counter) -> str:
+        path = os.path.join(PROFILE_DIR, datetime.now().strftime("%Y%m%d-%H%M%S"))
+        os.makedirs(path, exist_ok=True)
+
+        with open(os.path.join(path, 'spans.txt'), 'w', encoding='utf-8') as f:
+            f.write(f"{'span':<30} {'count':>8} {'total ms':>12} {'avg ms':>10} {'max ms':>10} {'alloc KiB':>10}\n")
+            for name, span in sorted(spans.items(), key=lambda item: -item[1]['total']):
+                f.write(
+                    f"{name:<30} {span['count']:>8} {span['total'] * 1000:>12.2f} "
+                    f"{span['total'] / span['count'] * 1000:>10.3f} {span['max'] * 1000:>10.3f} "
+                    f"{span['allocated'] / 1024:>10.1f}\n"
+                )
+
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            with open(os.path.join(path, 'allocations.txt'), 'w', encoding='utf-8') as f:
+                for stat in snapshot.statistics('lineno')[:ALLOCATIONS_TOP]:
+                    f.write(f"{stat}\n")
+
+        # Формат collapsed stacks для flamegraph.pl / speedscope
+        with open(os.path.join(path, 'stacks.collapsed'), 'w', encoding='utf-8') as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+        return path
+
+
+profiler = Profiler()
+
+
+def span(name: str):
+    """Декоратор именованного участка; без включенного профилирования почти бесплатен.
+
+    Для корутин время включает ожидания, а аллокации - чужие корутины,
+    выполнявшиеся в это время.
+    """
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not profiler.enabled:
+                    return await func(*args, **kwargs)
+
+                allocated_before = tracemalloc.get_traced_memory()[0]
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    profiler.record(
+                        name,
+                        time.perf_counter() - started,
+                        tracemalloc.get_traced_memory()[0] - allocated_before
+                    )
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+
+            allocated_before = tracemalloc.get_traced_memory()[0]
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.record(
+                    name,
+                    time.perf_counter() - started,
+                    tracemalloc.get_traced_memory()[0] - allocated_before
+                )
+        return wrapper
+
+    return decorator